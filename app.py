@@ -1,127 +1,43 @@
 
+import os
+import time
 import streamlit as st
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, select, func, or_
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from werkzeug.security import generate_password_hash, check_password_hash
-import pandas as pd
-import os
+from sqlalchemy import select, func
 
 st.set_page_config(page_title="WMS Streamlit", page_icon="📦", layout="wide")
 
-DB_URL = "sqlite:///wms_streamlit.db"
-engine = create_engine(DB_URL, echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, future=True)
-Base = declarative_base()
-
-# ---------- Models ----------
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True)
-    username = Column(String(80), unique=True, nullable=False)
-    password_hash = Column(String(255), nullable=False)
-    role = Column(String(32), nullable=False, default="picker")
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    def set_password(self, pw): self.password_hash = generate_password_hash(pw)
-    def check_password(self, pw): return check_password_hash(self.password_hash, pw)
-
-class Item(Base):
-    __tablename__ = "items"
-    id = Column(Integer, primary_key=True)
-    sku = Column(String(64), unique=True, nullable=False)
-    name = Column(String(200), nullable=False)
-    barcode = Column(String(128), unique=True, nullable=True)
-    bin_location = Column(String(64), nullable=True)
-    reorder_point = Column(Integer, default=0)
-    on_hand = Column(Integer, default=0)
-
-class Receipt(Base):
-    __tablename__ = "receipts"
-    id = Column(Integer, primary_key=True)
-    ref = Column(String(64), unique=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    vendor = Column(String(128), nullable=True)
-    status = Column(String(16), default="open")  # open, received
-    lines = relationship("ReceiptLine", back_populates="receipt", cascade="all, delete-orphan")
-
-class ReceiptLine(Base):
-    __tablename__ = "receipt_lines"
-    id = Column(Integer, primary_key=True)
-    receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=False)
-    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
-    qty = Column(Integer, nullable=False)
-    received_qty = Column(Integer, default=0)
-    item = relationship("Item")
-    receipt = relationship("Receipt", back_populates="lines")
-
-class Order(Base):
-    __tablename__ = "orders"
-    id = Column(Integer, primary_key=True)
-    ref = Column(String(64), unique=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    customer = Column(String(128), nullable=True)
-    status = Column(String(16), default="open")  # open, picking, packed, shipped, closed
-    picked_at = Column(DateTime, nullable=True)
-    shipped_at = Column(DateTime, nullable=True)
-    lines = relationship("OrderLine", back_populates="order", cascade="all, delete-orphan")
-    shipments = relationship("Shipment", back_populates="order", cascade="all, delete-orphan")
-
-class OrderLine(Base):
-    __tablename__ = "order_lines"
-    id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
-    qty = Column(Integer, nullable=False)
-    picked_qty = Column(Integer, default=0)
-    item = relationship("Item")
-    order = relationship("Order", back_populates="lines")
-
-class Shipment(Base):
-    __tablename__ = "shipments"
-    id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
-    carrier = Column(String(64), nullable=True)
-    tracking_no = Column(String(128), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    order = relationship("Order", back_populates="shipments")
-
-def seed(session):
-    # Items / Receipts / Orders
-    if not session.scalar(select(func.count(Item.id))):
-        items = [
-            Item(sku="SKU-001", name="Cardboard Box Small", barcode="1000001", bin_location="A1-01", reorder_point=20, on_hand=100),
-            Item(sku="SKU-002", name="Bubble Wrap 50m", barcode="1000002", bin_location="A1-02", reorder_point=10, on_hand=25),
-            Item(sku="SKU-003", name="Packing Tape", barcode="1000003", bin_location="B1-01", reorder_point=15, on_hand=60),
-        ]
-        session.add_all(items)
-        r = Receipt(ref="RCPT-001", vendor="Acme Supplies")
-        session.add(r); session.flush()
-        session.add_all([
-            ReceiptLine(receipt_id=r.id, item_id=1, qty=50),
-            ReceiptLine(receipt_id=r.id, item_id=2, qty=10),
-        ])
-        o = Order(ref="ORD-001", customer="PT Nusantara")
-        session.add(o); session.flush()
-        session.add_all([
-            OrderLine(order_id=o.id, item_id=1, qty=5),
-            OrderLine(order_id=o.id, item_id=3, qty=2),
-        ])
-        session.commit()
-
-    # Demo users
-    if not session.scalar(select(func.count(User.id))):
-        admin = User(username="admin", role="admin"); admin.set_password("admin123")
-        sup = User(username="supervisor", role="supervisor"); sup.set_password("super123")
-        pick = User(username="picker", role="picker"); pick.set_password("picker123")
-        session.add_all([admin, sup, pick]); session.commit()
-
-def ensure_db():
-    Base.metadata.create_all(bind=engine)
-    with SessionLocal() as s:
-        seed(s)
-
-ensure_db()
+from wms.db import SessionLocal, QueryCounter, run_transaction
+from wms.models import User, Item, Receipt, ReceiptLine, Order, OrderLine, ORDER_STATUSES
+from wms.kpi import bump_kpi, load_kpis
+from wms.queries import (ORDERS_PAGE_SIZE, ORDERS_PAGE_QUERY_BUDGET, count_orders, load_orders_page, load_item_options,
+                         load_low_stock_page, load_receipts_page)
+from wms.search import INVENTORY_COLUMNS, INVENTORY_PAGE_SIZE, INVENTORY_SORTS, search_items
+from wms.stock import StockError, pick_line, receive_lines, adjust_stock
+from wms.ledger import stock_at, reconcile
+from wms.allocation import allocate
+from wms.orders import OrderError, pack_order, ship_order, close_order
+from wms.waves import DEFAULT_MAX_ORDERS, plan_wave, release_wave, load_wave, open_waves, confirm_wave_picks
+from wms.bootstrap import ensure_db
+from wms import auth
+from wms import profiling
+from wms.profiling import span
+
+# Streamlit re-executes this script on every interaction, but imported modules (and
+# with them the engine and session factory in wms.db) live for the whole process.
+# Migrations and seeding likewise run once per process, not once per rerun, and so
+# does starting the replenishment worker thread when WMS_REPLENISH is set.
+# pandas is imported inside the pages that render tables, so the login screen of a
+# cold process does not pay for it.
+@st.cache_resource(show_spinner=False)
+def startup():
+    ensure_db()
+    if os.environ.get("WMS_REPLENISH"):
+        from wms.replenish import start_worker
+        start_worker()
+    return True
+
+startup()
 
 # ---------- Auth helpers ----------
 def login_form():
@@ -131,16 +47,70 @@ def login_form():
         password = st.text_input("Password", type="password")
         submitted = st.form_submit_button("Sign in")
     if submitted:
+        try:
+            with SessionLocal() as s:
+                user = auth.authenticate(s, username, password)
+                sid, handle = auth.start_session(s, user) if user else (None, None)
+        except auth.AuthBusy:
+            st.error("Sign-in is busy right now; please try again in a moment.")
+            return
+        if user:
+            sign_in(user, sid, handle)
+            st.success(f"Welcome, {user.username}!")
+            st.rerun()
+        else:
+            st.error("Invalid username or password")
+
+def sign_in(user, sid, handle):
+    st.session_state["user_id"] = user.id
+    st.session_state["username"] = user.username
+    st.session_state["role"] = user.role
+    st.session_state["token_gen"] = user.token_gen
+    st.session_state["sid"] = sid  # server-side only; the URL gets the single-use handle
+    set_handle(handle)
+
+def set_handle(handle):
+    st.query_params["session"] = handle  # survives reloads; see wms.auth
+    st.session_state["swap_handle_at"] = time.time() + auth.SESSION_TTL / 2
+
+def resume_session():
+    """Sign in from a live ?session= handle (swapping it for a new one); True if signed in."""
+    handle = st.query_params.get("session")
+    if not handle:
+        return False
+    with SessionLocal() as s:
+        hit = auth.resume_session(s, handle)
+    if hit is None:
+        del st.query_params["session"]
+        return False
+    sign_in(*hit)
+    return True
+
+def refresh_user():
+    """Pick up role/username changes, deletions and revocations from the user cache, and extend the
+    session (with a new handle) every SESSION_TTL / 2 while in use; False if the session is over."""
+    with SessionLocal() as s:
+        user = auth.get_user(s, st.session_state["user_id"])
+        alive = user is not None and user.token_gen == st.session_state.get("token_gen")
+        if alive and time.time() >= st.session_state.get("swap_handle_at", 0):
+            handle = auth.touch_session(s, st.session_state.get("sid"))
+            alive = handle is not None
+            if alive:
+                set_handle(handle)
+    if not alive:
+        sign_out()
+        return False
+    st.session_state["username"], st.session_state["role"] = user.username, user.role
+    return True
+
+def sign_out():
+    """End this browser's session; the user's sessions elsewhere stay signed in."""
+    sid = st.session_state.get("sid")
+    if sid is not None:
         with SessionLocal() as s:
-            user = s.execute(select(User).where(User.username==username)).scalar_one_or_none()
-            if user and user.check_password(password):
-                st.session_state["user_id"] = user.id
-                st.session_state["username"] = user.username
-                st.session_state["role"] = user.role
-                st.success(f"Welcome, {user.username}!")
-                st.experimental_rerun()
-            else:
-                st.error("Invalid username or password")
+            auth.end_session(s, sid)
+    st.session_state.clear()
+    st.query_params.clear()
 
 def guard(roles=None):
     if "user_id" not in st.session_state:
@@ -156,24 +126,55 @@ def topbar():
     with col1: st.markdown(f"### 📦 WMS — **{u}** <span style='font-size:0.8em'>(**{role}**)</span>", unsafe_allow_html=True)
     with col5:
         if st.button("Logout"):
-            st.session_state.clear(); st.experimental_rerun()
+            sign_out(); st.rerun()
+
+# ---------- Tables ----------
+# Tables show one keyset page at a time (wms.queries.keyset_page). st.session_state[name]
+# holds the `after` key of every page visited, so Prev is a pop and Next a push.
+def page_key(name):
+    return st.session_state.setdefault(name, [None])[-1]
+
+def reset_pager(name):
+    st.session_state[name] = [None]
+
+def pager(name, page, total=None, page_size=None):
+    keys = st.session_state.setdefault(name, [None])
+    c1, c2, c3 = st.columns([1,1,6])
+    c1.button("◀ Prev", key=f"{name}_prev", disabled=len(keys) == 1, on_click=keys.pop)
+    c2.button("Next ▶", key=f"{name}_next", disabled=page.next_key is None, on_click=keys.append, args=(page.next_key,))
+    c3.caption(f"Page {len(keys)}" + (f" of {max(1, -(-total // page_size))} · {total} rows" if total is not None else ""))
+
+def export_download(name, q=None, status=None):
+    """Encode the export from a streaming cursor on request and offer it as a download."""
+    from wms.export import FORMATS, ExportError, file_name, iter_export
+    c1, c2 = st.columns([1,3])
+    fmt = c1.selectbox("Format", list(FORMATS), key=f"{name}_export_fmt")
+    if c2.button("Prepare download", key=f"{name}_export"):
+        try:
+            with SessionLocal() as s:
+                data = b"".join(iter_export(s, name, fmt, q, status))
+        except ExportError as e:
+            st.error(str(e))
+        else:
+            c2.download_button(f"Download {name}.{fmt} ({len(data) // 1024:,} KiB)", data, file_name(name, fmt), FORMATS[fmt],
+                               key=f"{name}_download")
+    st.caption("For very large tables use `python -m wms.export` or the scanner API's `/export/` endpoint, "
+               "which stream without holding the file in memory.")
 
 # ---------- Pages ----------
 def page_dashboard():
+    import pandas as pd
     guard()
     st.title("Dashboard")
     with SessionLocal() as s:
-        total_on_hand = s.scalar(select(func.coalesce(func.sum(Item.on_hand),0)))
-        status_counts = {}
-        for stt in ["open","picking","packed","shipped","closed"]:
-            status_counts[stt] = s.scalar(select(func.count(Order.id)).where(Order.status==stt))
+        kpi = load_kpis(s)
+        total_on_hand = kpi.get("on_hand", 0)
+        status_counts = {stt: kpi.get(f"orders:{stt}", 0) + kpi.get(f"archived:orders:{stt}", 0) for stt in ORDER_STATUSES}
         # Average fulfillment time
-        shipped = s.execute(select(Order).where(Order.shipped_at.is_not(None))).scalars().all()
-        if shipped:
-            avg_hours = round(sum([(o.shipped_at - o.created_at).total_seconds()/3600.0 for o in shipped])/len(shipped),2)
-        else:
-            avg_hours = None
-        low_stock = s.execute(select(Item).where(Item.on_hand <= Item.reorder_point)).scalars().all()
+        fulfilled = kpi.get("fulfilled", 0)
+        avg_hours = round(kpi.get("fulfill_seconds", 0)/3600.0/fulfilled, 2) if fulfilled else None
+        low_stock = load_low_stock_page(s, page_key("low_stock_pages"))
+        drafts = s.scalar(select(func.count(Receipt.id)).where(Receipt.status=="draft"))
 
     c1,c2,c3,c4 = st.columns(4)
     c1.metric("Total On Hand", total_on_hand)
@@ -182,29 +183,71 @@ def page_dashboard():
     c4.metric("Avg Fulfillment (hrs)", avg_hours if avg_hours is not None else "—")
 
     st.subheader("Low Stock Alerts")
-    if low_stock:
-        df = pd.DataFrame([{"SKU":i.sku, "Name":i.name, "OnHand":i.on_hand, "ROP":i.reorder_point} for i in low_stock])
-        st.dataframe(df, use_container_width=True)
+    if drafts:
+        st.info(f"{drafts} draft replenishment receipt(s) awaiting approval on the Inbound page.")
+    if low_stock.rows or len(st.session_state["low_stock_pages"]) > 1:
+        st.dataframe(pd.DataFrame.from_records(low_stock.rows, columns=["SKU","Name","OnHand","ROP"]), use_container_width=True)
+        pager("low_stock_pages", low_stock)
     else:
         st.success("No items below reorder point 🎉")
 
 def page_inventory():
+    import pandas as pd
     guard()
     st.title("Inventory")
-    q = st.text_input("Search (SKU / Name / Barcode)")
+    c1, c2, c3 = st.columns([3,1,1])
+    with c1:
+        q = st.text_input("Search (SKU / Name / Barcode)", on_change=reset_pager, args=("inventory_pages",)).strip()
+    with c2:
+        sort = st.selectbox("Sort by", list(INVENTORY_SORTS), on_change=reset_pager, args=("inventory_pages",))
+    with c3:
+        descending = st.toggle("Descending", on_change=reset_pager, args=("inventory_pages",))
     with SessionLocal() as s:
-        qry = select(Item)
-        if q:
-            like = f"%{q}%"
-            qry = qry.where(or_(Item.sku.ilike(like), Item.name.ilike(like), Item.barcode.ilike(like)))
-        items = s.execute(qry.order_by(Item.sku)).scalars().all()
-    df = pd.DataFrame([vars(i) for i in items]) if items else pd.DataFrame(columns=["sku","name","barcode","bin_location","reorder_point","on_hand"])
-    if not df.empty:
-        df = df[["sku","name","barcode","bin_location","reorder_point","on_hand"]]
-    st.dataframe(df, use_container_width=True)
+        page, total = search_items(s, q, sort, page_key("inventory_pages"), descending=descending)
+    rows = page.rows
+    st.dataframe(pd.DataFrame.from_records(rows, columns=INVENTORY_COLUMNS), use_container_width=True)
+    pager("inventory_pages", page, total, INVENTORY_PAGE_SIZE)
+    with st.expander("Export"):
+        export_download("inventory", q=q)
+
+    with st.expander("Stock as of (UTC)"):
+        d1, d2 = st.columns(2)
+        as_of = datetime.combine(d1.date_input("Date", value=datetime.utcnow().date()), d2.time_input("Time", value=datetime.utcnow().time()))
+        if rows:
+            with SessionLocal() as s:
+                ids = dict(s.execute(select(Item.id, Item.sku).where(Item.sku.in_([r[0] for r in rows]))).all())
+                then = stock_at(s, as_of, list(ids))
+            st.dataframe(pd.DataFrame([(ids[iid], qty) for iid, qty in then.items()], columns=["sku", "on_hand_at"]).sort_values("sku"),
+                         use_container_width=True)
 
     if st.session_state.get("role")=="admin":
         st.divider()
+        st.subheader("Adjust Stock (Admin)")
+        with st.form("adjust_stock"):
+            a1, a2 = st.columns(2)
+            adj_sku = a1.text_input("SKU", key="adj_sku")
+            delta = a2.number_input("Change (+/-)", step=1, value=0)
+            if st.form_submit_button("Post Adjustment"):
+                with SessionLocal() as s:
+                    iid = s.scalar(select(Item.id).where(Item.sku==adj_sku.strip()))
+                if iid is None:
+                    st.error("Unknown SKU.")
+                else:
+                    try:
+                        run_transaction(adjust_stock, iid, int(delta))
+                    except StockError as e:
+                        st.error(str(e))
+                    else:
+                        st.success("Adjustment posted."); st.rerun()
+        if st.button("Reconcile On-Hand with Ledger"):
+            with SessionLocal() as s:
+                mismatched = reconcile(s)
+            if mismatched:
+                st.warning(f"{len(mismatched)} item(s) differ from the ledger.")
+                st.dataframe(pd.DataFrame([r[1:] for r in mismatched], columns=["sku","on_hand","ledger"]), use_container_width=True)
+            else:
+                st.success("On-hand matches the ledger for every item.")
+
         st.subheader("Add Item (Admin)")
         with st.form("add_item"):
             sku = st.text_input("SKU")
@@ -224,14 +267,15 @@ def page_inventory():
                         s.add(Item(sku=sku, name=name, barcode=barcode or None, bin_location=bin_loc or None, reorder_point=int(rop), on_hand=0))
                         s.commit()
                         st.success("Item created.")
-                        st.experimental_rerun()
+                        st.rerun()
 
 def page_inbound():
+    import pandas as pd
     guard()
     st.title("Inbound")
     with SessionLocal() as s:
-        receipts = s.execute(select(Receipt).order_by(Receipt.created_at.desc())).scalars().all()
-        items = s.execute(select(Item).order_by(Item.sku)).scalars().all()
+        receipts = load_receipts_page(s, after=page_key("receipt_pages"))
+        item_options = load_item_options(s, with_stock=False)
 
     c1, c2 = st.columns([1,2])
     with c1:
@@ -250,52 +294,73 @@ def page_inbound():
                     else:
                         s.add(Receipt(ref=ref, vendor=vendor or None))
                         s.commit()
-                        st.success("Receipt created."); st.experimental_rerun()
+                        st.success("Receipt created."); st.rerun()
 
     st.subheader("Receipts")
-    for r in receipts:
-        with st.expander(f"{r.ref} — {r.vendor or '—'}  [{r.status}]"):
-            with SessionLocal() as s:
-                r_obj = s.get(Receipt, r.id)
-                r_items = s.execute(select(Item).order_by(Item.sku)).scalars().all()
-            with st.form(f"add_line_{r.id}"):
-                item_options = {f"{it.sku} — {it.name}": it.id for it in r_items}
-                item_label = st.selectbox("Item", list(item_options.keys()))
-                qty = st.number_input("Qty", min_value=1, step=1, value=1)
-                if st.form_submit_button("Add Line"):
-                    with SessionLocal() as s:
-                        s.add(ReceiptLine(receipt_id=r.id, item_id=item_options[item_label], qty=int(qty)))
-                        s.commit(); st.success("Line added."); st.experimental_rerun()
-
-            with SessionLocal() as s:
-                lines = s.execute(select(ReceiptLine).where(ReceiptLine.receipt_id==r.id)).scalars().all()
-            if lines:
-                df = pd.DataFrame([{"SKU":ln.item.sku, "Name":ln.item.name, "Qty":ln.qty, "Received":ln.received_qty, "LineID":ln.id} for ln in lines])
-                st.dataframe(df[["SKU","Name","Qty","Received"]], use_container_width=True)
-                for ln in lines:
-                    with st.form(f"recv_{ln.id}", clear_on_submit=True):
-                        recv = st.number_input(f"Receive qty for {ln.item.sku}", min_value=1, step=1, value=1, key=f"recv_{ln.id}_val")
+    with span("receipt expanders"):
+        for r in receipts.rows:
+            with st.expander(f"{r.ref} — {r.vendor or '—'}  [{r.status}]"):
+                with st.form(f"add_line_{r.id}"):
+                    item_label = st.selectbox("Item", list(item_options.keys()))
+                    qty = st.number_input("Qty", min_value=1, step=1, value=1)
+                    if st.form_submit_button("Add Line"):
+                        with SessionLocal() as s:
+                            s.add(ReceiptLine(receipt_id=r.id, item_id=item_options[item_label], qty=int(qty)))
+                            s.commit(); st.success("Line added."); st.rerun()
+
+                lines = r.lines
+                if lines and r.status != "open":
+                    st.dataframe(pd.DataFrame([(ln.id, ln.item.sku, ln.item.name, ln.qty, ln.received_qty) for ln in lines],
+                                              columns=["LineID","SKU","Name","Qty","Received"]).set_index("LineID"),
+                                 use_container_width=True)
+                    if r.status == "draft":
+                        st.caption("Approve the draft to receive against it.")
+                elif lines:
+                    df = pd.DataFrame([(ln.id, ln.item.sku, ln.item.name, ln.qty, ln.received_qty, 0) for ln in lines],
+                                      columns=["LineID","SKU","Name","Qty","Received","Receive"]).set_index("LineID")
+                    with st.form(f"recv_{r.id}", clear_on_submit=True):
+                        edited = st.data_editor(df, use_container_width=True, key=f"recv_grid_{r.id}",
+                                                disabled=["SKU","Name","Qty","Received"],
+                                                column_config={"Receive": st.column_config.NumberColumn(min_value=0, step=1)})
                         if st.form_submit_button("Receive"):
+                            n = run_transaction(receive_lines, edited["Receive"].to_dict())
+                            st.success(f"Received {n} units."); st.rerun()
+                    remaining = {ln.id: ln.qty - ln.received_qty for ln in lines if ln.qty > ln.received_qty}
+                    if remaining and st.button("Receive All Remaining", key=f"recv_all_{r.id}"):
+                        n = run_transaction(receive_lines, remaining)
+                        st.success(f"Received {n} units."); st.rerun()
+                colA, colB = st.columns(2)
+                with colB:
+                    if r.status == "draft" and st.session_state.get("role") in ("admin","supervisor"):
+                        if st.button("Approve Draft", key=f"approve_{r.id}"):
                             with SessionLocal() as s:
-                                line = s.get(ReceiptLine, ln.id)
-                                item = s.get(Item, line.item_id)
-                                line.received_qty += int(recv)
-                                item.on_hand += int(recv)
-                                s.commit()
-                                st.success("Received recorded."); st.experimental_rerun()
-            colA, colB = st.columns(2)
-            with colA:
-                if st.button("Close Receipt", key=f"close_{r.id}"):
-                    with SessionLocal() as s:
-                        rr = s.get(Receipt, r.id); rr.status = "received"; s.commit()
-                        st.success("Receipt closed."); st.experimental_rerun()
+                                s.get(Receipt, r.id).status = "open"; s.commit()
+                            st.success("Receipt approved."); st.rerun()
+                with colA:
+                    if st.button("Close Receipt", key=f"close_{r.id}"):
+                        with SessionLocal() as s:
+                            rr = s.get(Receipt, r.id); rr.status = "received"; s.commit()
+                            st.success("Receipt closed."); st.rerun()
+    pager("receipt_pages", receipts)
+    with st.expander("Export receipt lines"):
+        export_download("receipt_lines")
 
 def page_orders():
+    import pandas as pd
     guard()
     st.title("Orders")
-    with SessionLocal() as s:
-        orders = s.execute(select(Order).order_by(Order.created_at.desc())).scalars().all()
-        items = s.execute(select(Item).order_by(Item.sku)).scalars().all()
+    f1, f2 = st.columns([1,1])
+    with f1:
+        status = st.selectbox("Status", ["all"] + ORDER_STATUSES, on_change=reset_pager, args=("order_pages",))
+        status = None if status == "all" else status
+    with QueryCounter() as qc:
+        with SessionLocal() as s:
+            total = count_orders(s, status)
+            orders = load_orders_page(s, status=status, after=page_key("order_pages"))
+            options = load_item_options(s) if st.session_state.get("role") in ("admin","supervisor") else {}
+    with f2:
+        with st.expander("Export order lines"):
+            export_download("order_lines", status=status)
 
     st.subheader("Create Order")
     if st.session_state.get("role") in ("admin","supervisor"):
@@ -310,93 +375,139 @@ def page_orders():
                         if s.execute(select(Order).where(Order.ref==ref)).scalar_one_or_none():
                             st.error("Ref already exists.")
                         else:
-                            s.add(Order(ref=ref, customer=customer or None)); s.commit()
-                            st.success("Order created."); st.experimental_rerun()
+                            s.add(Order(ref=ref, customer=customer or None)); bump_kpi(s, "orders:open", 1); s.commit()
+                            st.success("Order created."); st.rerun()
     else:
         st.info("Only admin/supervisor can create orders.")
 
     st.subheader("All Orders")
-    for o in orders:
-        with st.expander(f"{o.ref} — {o.customer or '—'}  [{o.status}]"):
-            with SessionLocal() as s:
-                o_obj = s.get(Order, o.id)
-                inv = s.execute(select(Item).order_by(Item.sku)).scalars().all()
-
-            # Add line
-            if st.session_state.get("role") in ("admin","supervisor"):
-                with st.form(f"add_line_{o.id}"):
-                    options = {f\"{it.sku} — {it.name} (OnHand:{it.on_hand})\": it.id for it in inv}
-                    label = st.selectbox("Item", list(options.keys()))
-                    qty = st.number_input("Qty", min_value=1, step=1, value=1)
-                    if st.form_submit_button("Add Line"):
-                        with SessionLocal() as s:
-                            s.add(OrderLine(order_id=o.id, item_id=options[label], qty=int(qty)))
-                            s.commit(); st.success("Line added."); st.experimental_rerun()
-            else:
-                st.caption("Only admin/supervisor can add lines.")
-
-            # Lines view
-            with SessionLocal() as s:
-                lines = s.execute(select(OrderLine).where(OrderLine.order_id==o.id)).scalars().all()
-            if lines:
-                df = pd.DataFrame([{"SKU":l.item.sku, "Name":l.item.name, "Ordered":l.qty, "Picked":l.picked_qty, "Bin":l.item.bin_location, "LineID":l.id} for l in lines])
-                st.dataframe(df[["SKU","Name","Ordered","Picked","Bin"]], use_container_width=True)
-
-                # Picking (all roles including picker)
-                for l in lines:
-                    if st.session_state.get("role") in ("admin","supervisor","picker"):
-                        with st.form(f"pick_{l.id}"):
-                            pick = st.number_input(f"Pick qty for {l.item.sku}", min_value=1, step=1, value=1, key=f"pick_{o.id}_{l.id}")
-                            if st.form_submit_button("Pick"):
-                                with SessionLocal() as s:
-                                    line = s.get(OrderLine, l.id)
-                                    item = s.get(Item, line.item_id)
-                                    if pick > item.on_hand:
-                                        st.error("Not enough stock to pick")
-                                    else:
-                                        line.picked_qty += int(pick)
-                                        item.on_hand -= int(pick)
-                                        order = s.get(Order, o.id)
-                                        order.status = "picking"; order.picked_at = datetime.utcnow()
-                                        s.commit()
-                                        st.success("Picked recorded."); st.experimental_rerun()
-                    else:
-                        st.caption("Only picker/supervisor/admin can do picking.")
-
-            # Pack / Ship / Close
-            col1, col2, col3 = st.columns(3)
-            with col1:
+    if st.session_state.get("role") in ("admin","supervisor") and st.button("Allocate Stock"):
+        n = run_transaction(allocate)
+        st.success(f"Allocated {n} units to open order lines."); st.rerun()
+    st.caption(f"queries this render: {qc.count} (budget {ORDERS_PAGE_QUERY_BUDGET})")
+    if qc.count > ORDERS_PAGE_QUERY_BUDGET:
+        st.warning("Orders page exceeded its query budget.")
+    with span("order expanders"):
+        for o in orders.rows:
+            with st.expander(f"{o.ref} — {o.customer or '—'}  [{o.status}]"):
+                # Add line
                 if st.session_state.get("role") in ("admin","supervisor"):
-                    if st.button("Pack", key=f"pack_{o.id}"):
-                        with SessionLocal() as s:
-                            oo = s.get(Order, o.id)
-                            if any(ln.picked_qty < ln.qty for ln in oo.lines):
-                                st.error("Cannot pack: some lines not fully picked.")
-                            else:
-                                oo.status = "packed"; s.commit(); st.success("Order packed."); st.experimental_rerun()
-            with col2:
-                if st.session_state.get("role") in ("admin","supervisor"):
-                    with st.form(f"ship_{o.id}"):
-                        carrier = st.text_input("Carrier")
-                        tracking = st.text_input("Tracking #")
-                        if st.form_submit_button("Ship"):
+                    with st.form(f"add_line_{o.id}"):
+                        label = st.selectbox("Item", list(options.keys()))
+                        qty = st.number_input("Qty", min_value=1, step=1, value=1)
+                        if st.form_submit_button("Add Line"):
                             with SessionLocal() as s:
-                                oo = s.get(Order, o.id)
-                                s.add(Shipment(order_id=oo.id, carrier=carrier or None, tracking_no=tracking or None))
-                                oo.status = "shipped"; oo.shipped_at = datetime.utcnow(); s.commit()
-                                st.success("Shipment created."); st.experimental_rerun()
-            with col3:
-                if st.session_state.get("role") in ("admin","supervisor"):
-                    if st.button("Close", key=f"close_{o.id}"):
-                        with SessionLocal() as s:
-                            oo = s.get(Order, o.id)
-                            oo.status = "closed"; s.commit(); st.success("Order closed."); st.experimental_rerun()
+                                s.add(OrderLine(order_id=o.id, item_id=options[label], qty=int(qty))); s.flush()
+                                allocate(s, [options[label]])
+                                s.commit(); st.success("Line added."); st.rerun()
+                else:
+                    st.caption("Only admin/supervisor can add lines.")
+
+                # Lines view
+                lines = o.lines
+                if lines:
+                    df = pd.DataFrame([{"SKU":l.item.sku, "Name":l.item.name, "Ordered":l.qty, "Allocated":l.allocated_qty, "Picked":l.picked_qty, "Bin":l.item.bin_location, "LineID":l.id} for l in lines])
+                    st.dataframe(df[["SKU","Name","Ordered","Allocated","Picked","Bin"]], use_container_width=True)
+
+                    # Picking (all roles including picker)
+                    for l in lines:
+                        if st.session_state.get("role") in ("admin","supervisor","picker"):
+                            with st.form(f"pick_{l.id}"):
+                                pick = st.number_input(f"Pick qty for {l.item.sku}", min_value=1, step=1, value=1, key=f"pick_{o.id}_{l.id}")
+                                if st.form_submit_button("Pick"):
+                                    try:
+                                        run_transaction(pick_line, l.id, pick)
+                                    except StockError as e:
+                                        st.error(str(e))
+                                    else:
+                                        st.success("Picked recorded."); st.rerun()
+                        else:
+                            st.caption("Only picker/supervisor/admin can do picking.")
+
+                # Pack / Ship / Close
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    if st.session_state.get("role") in ("admin","supervisor"):
+                        if st.button("Pack", key=f"pack_{o.id}"):
+                            try:
+                                run_transaction(pack_order, o.id)
+                            except OrderError as e:
+                                st.error(str(e))
+                            else:
+                                st.success("Order packed."); st.rerun()
+                with col2:
+                    if st.session_state.get("role") in ("admin","supervisor"):
+                        with st.form(f"ship_{o.id}"):
+                            carrier = st.text_input("Carrier")
+                            tracking = st.text_input("Tracking #")
+                            if st.form_submit_button("Ship"):
+                                run_transaction(ship_order, o.id, carrier, tracking)
+                                st.success("Shipment created."); st.rerun()
+                with col3:
+                    if st.session_state.get("role") in ("admin","supervisor"):
+                        if st.button("Close", key=f"close_{o.id}"):
+                            run_transaction(close_order, o.id)
+                            st.success("Order closed."); st.rerun()
+    pager("order_pages", orders, total, ORDERS_PAGE_SIZE)
+
+def page_waves():
+    import pandas as pd
+    guard()
+    st.title("Waves")
+    role = st.session_state.get("role")
+    if role in ("admin","supervisor"):
+        st.subheader("Plan Wave")
+        c1, c2, c3, c4 = st.columns(4)
+        max_orders = c1.number_input("Max orders", min_value=1, step=10, value=DEFAULT_MAX_ORDERS)
+        max_lines = c2.number_input("Max lines (0 = no limit)", min_value=0, step=50, value=0)
+        max_units = c3.number_input("Max units (0 = no limit)", min_value=0, step=100, value=0)
+        cutoff_date = c4.date_input("Cutoff (orders created on/before)", value=datetime.utcnow().date())
+        cutoff = datetime.combine(cutoff_date, datetime.max.time())
+        params = dict(max_orders=int(max_orders), max_lines=int(max_lines) or None, max_units=int(max_units) or None, cutoff=cutoff)
+        with SessionLocal() as s:
+            plan = plan_wave(s, **params)
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Orders", len(plan.orders))
+        m2.metric("Pick stops", len(plan.pick_list))
+        m3.metric("Units", plan.units)
+        m4.metric("Est. travel", plan.travel)
+        if plan.orders and st.button("Release Wave"):
+            def _release(s):
+                return release_wave(s, plan_wave(s, **params))
+            wave_id = run_transaction(_release)
+            st.success(f"Wave {wave_id} released."); st.rerun()
+
+    st.subheader("Released Waves")
+    with SessionLocal() as s:
+        waves = open_waves(s)
+    if not waves:
+        st.info("No released waves.")
+        return
+    labels = {f"Wave {wid} — {n} orders — {created:%Y-%m-%d %H:%M}": wid for wid, created, n in waves}
+    wave_id = labels[st.selectbox("Wave", list(labels.keys()))]
+    with SessionLocal() as s:
+        plan = load_wave(s, wave_id)
+    st.caption(f"{len(plan.pick_list)} stops · {plan.units} units · est. travel {plan.travel}")
+    df = pd.DataFrame([(r["item_id"], r["bin"], r["sku"], r["name"], r["qty"], ", ".join(f"#{k}:{v}" for k, v in r["slots"].items()), r["qty"])
+                       for r in plan.pick_list], columns=["ItemID","Bin","SKU","Name","Qty","Put-wall","Picked"]).set_index("ItemID")
+    with st.form(f"wave_pick_{wave_id}"):
+        edited = st.data_editor(df, use_container_width=True, disabled=["Bin","SKU","Name","Qty","Put-wall"],
+                                column_config={"Picked": st.column_config.NumberColumn(min_value=0, step=1)})
+        if st.form_submit_button("Confirm Picks"):
+            short = run_transaction(confirm_wave_picks, wave_id, edited["Picked"].to_dict())
+            if short:
+                st.warning(f"Short picks on {len(short)} item(s); remaining lines stay on the wave.")
+            else:
+                st.success("Wave picks recorded."); st.rerun()
+    with st.expander("Put wall"):
+        st.dataframe(pd.DataFrame(plan.put_wall, columns=["slot","ref","sku","qty"]), use_container_width=True)
 
 def page_users():
+    import pandas as pd
     guard(["admin"])
     st.title("Users (Admin)")
     with SessionLocal() as s:
-        users = s.execute(select(User).order_by(User.username)).scalars().all()
+        users = auth.list_users(s)
     df = pd.DataFrame([{"ID":u.id,"Username":u.username,"Role":u.role,"Created":u.created_at.strftime("%Y-%m-%d %H:%M")} for u in users])
     st.dataframe(df, use_container_width=True)
 
@@ -415,17 +526,14 @@ def page_users():
                     st.error("Username already exists.")
                 else:
                     nu = User(username=username, role=role); nu.set_password(password); s.add(nu); s.commit()
-                    st.success("User created."); st.experimental_rerun()
+                    auth.invalidate()
+                    st.success("User created."); st.rerun()
 
     st.subheader("Edit / Reset / Delete")
-    with SessionLocal() as s:
-        users = s.execute(select(User).order_by(User.username)).scalars().all()
-    user_map = {f"{u.username} ({u.role})": u.id for u in users}
+    user_map = {f"{u.username} ({u.role})": u for u in users}
     if user_map:
         sel = st.selectbox("Select User", list(user_map.keys()))
-        uid = user_map[sel]
-        with SessionLocal() as s:
-            u = s.get(User, uid)
+        u = user_map[sel]; uid = u.id
         new_username = st.text_input("New Username", value=u.username, key=f"nu_{uid}")
         new_role = st.selectbox("New Role", ["admin","supervisor","picker"], index=["admin","supervisor","picker"].index(u.role), key=f"nr_{uid}")
         col1,col2,col3 = st.columns(3)
@@ -438,7 +546,11 @@ def page_users():
                     if exists:
                         st.error("Username is already taken.")
                     else:
-                        uu.username = new_username; uu.role = new_role; s.commit(); st.success("User updated."); st.experimental_rerun()
+                        role_changed = uu.role != new_role
+                        uu.username = new_username; uu.role = new_role; s.commit(); auth.invalidate(uid)
+                        if role_changed:
+                            auth.revoke_user_sessions(s, uid)
+                        st.success("User updated."); st.rerun()
         with col2:
             new_pw = st.text_input("Reset Password", type="password", key=f"rpw_{uid}")
             if st.button("Reset"):
@@ -446,14 +558,79 @@ def page_users():
                     st.error("New password required.")
                 else:
                     with SessionLocal() as s:
-                        uu = s.get(User, uid); uu.set_password(new_pw); s.commit(); st.success("Password reset."); st.experimental_rerun()
+                        uu = s.get(User, uid); uu.set_password(new_pw); s.commit(); auth.revoke_user_sessions(s, uid)
+                        st.success("Password reset."); st.rerun()
         with col3:
             if st.button("Delete"):
                 if uid == st.session_state.get("user_id"):
                     st.error("You cannot delete your own account.")
                 else:
                     with SessionLocal() as s:
-                        uu = s.get(User, uid); s.delete(uu); s.commit(); st.success("User deleted."); st.experimental_rerun()
+                        uu = s.get(User, uid); s.delete(uu); s.commit(); auth.invalidate(uid)
+                        st.success("User deleted."); st.rerun()
+
+def page_import():
+    import pandas as pd
+    from wms.importer import KINDS as IMPORT_KINDS, DEFAULT_CHUNKSIZE, ImportFileError, import_file
+    guard(["admin"])
+    st.title("Bulk Import (Admin)")
+    st.caption("items: sku, name[, barcode, bin_location, reorder_point, on_hand] · "
+               "receipts: ref, sku, qty[, vendor] · orders: ref, sku, qty[, customer]")
+    with st.form("bulk_import"):
+        kind = st.selectbox("Import", list(IMPORT_KINDS))
+        upload = st.file_uploader("CSV or Parquet file", type=["csv", "parquet", "pq"])
+        chunksize = st.number_input("Rows per transaction", min_value=100, step=500, value=DEFAULT_CHUNKSIZE)
+        submitted = st.form_submit_button("Import")
+    if submitted:
+        if not upload:
+            st.error("Choose a file to import.")
+        else:
+            try:
+                with st.spinner("Importing..."):
+                    report = import_file(kind, upload, int(chunksize))
+            except ImportFileError as e:
+                st.error(str(e))
+            else:
+                c1,c2,c3,c4 = st.columns(4)
+                c1.metric("Rows", report.rows)
+                c2.metric("Imported", report.imported)
+                c3.metric("Rejected", report.rejected)
+                c4.metric("Rows/sec", f"{report.rows_per_sec:,.0f}")
+                if report.rejects:
+                    st.dataframe(pd.DataFrame(report.rejects, columns=["Row","Reason"]), use_container_width=True)
+
+def page_performance():
+    import pandas as pd
+    guard(["admin"])
+    st.title("Performance")
+    enabled = st.toggle("Profile reruns (all sessions in this process)", value=profiling.is_enabled())
+    if enabled != profiling.is_enabled():
+        profiling.enable() if enabled else profiling.disable()
+        st.rerun()
+    reruns = profiling.history()
+    if not reruns:
+        st.info("No profiled reruns yet." if enabled else "Profiling is off; enable it and use the app.")
+        return
+    st.dataframe(pd.DataFrame([{"At": datetime.fromtimestamp(r.started).strftime("%H:%M:%S"), "Page": r.label, "User": r.user,
+                                "Wall ms": round(r.wall_ms, 1), "Queries": r.queries, "DB ms": round(r.db_ms, 1),
+                                "Objects": r.objects} for r in reruns]), use_container_width=True, height=260)
+    c1, c2 = st.columns([1, 1])
+    with c1:
+        st.download_button("Download JSON lines", profiling.to_jsonl(reruns), file_name="wms-profile.jsonl", mime="application/x-ndjson")
+    with c2:
+        if st.button("Clear history"):
+            profiling.clear(); st.rerun()
+
+    st.subheader("Slowest statements (all reruns)")
+    st.dataframe(pd.DataFrame(profiling.top_statements(reruns)), use_container_width=True)
+
+    st.subheader("Rerun detail")
+    idx = st.selectbox("Rerun", range(len(reruns)),
+                       format_func=lambda i: f"{datetime.fromtimestamp(reruns[i].started):%H:%M:%S} {reruns[i].label} ({reruns[i].wall_ms:.0f} ms)")
+    r = reruns[idx]
+    st.dataframe(pd.DataFrame([{"Span": "  " * d + n, "ms": round(ms, 1), "Queries": q} for n, d, ms, q in r.spans]),
+                 use_container_width=True)
+    st.dataframe(pd.DataFrame(r.slowest()), use_container_width=True)
 
 def page_change_password():
     guard()
@@ -466,34 +643,55 @@ def page_change_password():
         uid = st.session_state.get("user_id")
         with SessionLocal() as s:
             u = s.get(User, uid)
-            if not u.check_password(old):
+            try:
+                ok = auth.verify_password(u.password_hash, old)
+            except auth.AuthBusy:
+                st.error("Password checks are busy right now; please try again in a moment.")
+                return
+            if not ok:
                 st.error("Old password incorrect.")
             elif not new:
                 st.error("New password cannot be empty.")
             else:
-                u.set_password(new); s.commit(); st.success("Password changed.")
+                u.set_password(new); s.commit()
+                # ends the user's other sessions, and this one; start a fresh one here
+                auth.revoke_user_sessions(s, uid)
+                user = auth.get_user(s, uid)
+                sign_in(user, *auth.start_session(s, user))
+                st.success("Password changed.")
 
 # ---------- App ----------
 def main():
-    if "user_id" not in st.session_state:
+    if "user_id" in st.session_state:
+        signed_in = refresh_user()
+    else:
+        signed_in = resume_session()
+    if not signed_in:
         st.sidebar.title("WMS Streamlit")
         st.sidebar.info("Please log in to continue.")
         login_form()
         st.stop()
 
-    topbar()
-    st.sidebar.title("Navigation")
-    pages = {
-        "Dashboard": page_dashboard,
-        "Inventory": page_inventory,
-        "Inbound": page_inbound,
-        "Orders": page_orders,
-        "Change Password": page_change_password
-    }
-    if st.session_state.get("role") == "admin":
-        pages["Users (Admin)"] = page_users
-    choice = st.sidebar.radio("Go to", list(pages.keys()), label_visibility="collapsed")
-    pages[choice]()
+    with profiling.rerun("app", st.session_state.get("username")) as prof:
+        topbar()
+        st.sidebar.title("Navigation")
+        pages = {
+            "Dashboard": page_dashboard,
+            "Inventory": page_inventory,
+            "Inbound": page_inbound,
+            "Orders": page_orders,
+            "Waves": page_waves,
+            "Change Password": page_change_password
+        }
+        if st.session_state.get("role") == "admin":
+            pages["Users (Admin)"] = page_users
+            pages["Import (Admin)"] = page_import
+            pages["Performance"] = page_performance
+        choice = st.sidebar.radio("Go to", list(pages.keys()), label_visibility="collapsed")
+        if prof is not None:
+            prof.label = choice
+        with span(pages[choice].__name__):
+            pages[choice]()
 
 if __name__ == "__main__":
     main()
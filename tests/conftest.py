@@ -0,0 +1,18 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from wms import auth
+from wms.db import make_engine
+from wms.migrations import migrate
+
+@pytest.fixture
+def Session(tmp_path):
+    """Session factory for a fresh, migrated database (with its archive file) under tmp_path."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'wms.db'}")
+    migrate(engine)
+    auth.invalidate()  # user ids repeat across test databases
+    try:
+        yield sessionmaker(bind=engine, autoflush=False, future=True)
+    finally:
+        auth.invalidate()
+        engine.dispose()
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+
+from wms.allocation import allocate
+from wms.importer import import_file
+from wms.models import Item, Order, OrderLine
+from wms.orders import close_order, ship_order
+from wms.stock import pick_line
+
+T0 = datetime(2026, 1, 1)
+
+def _order(s, ref, item, qty, minutes):
+    o = Order(ref=ref, status="open", created_at=T0 + timedelta(minutes=minutes)); s.add(o); s.flush()
+    line = OrderLine(order_id=o.id, item_id=item.id, qty=qty); s.add(line); s.flush()
+    return o, line
+
+def _allocated(s, *lines):
+    return [s.scalar(select(OrderLine.allocated_qty).where(OrderLine.id==ln.id)) for ln in lines]
+
+def _assert_reserved_matches_lines(s, item):
+    open_lines = (select(func.coalesce(func.sum(OrderLine.allocated_qty), 0))
+                  .join(Order, Order.id==OrderLine.order_id)
+                  .where(OrderLine.item_id==item.id, Order.status.in_(["open", "picking"])))
+    s.refresh(item)
+    assert item.reserved == s.scalar(open_lines)
+    assert 0 <= item.reserved <= item.on_hand
+
+def test_allocation_is_fifo_without_skipping_ahead(Session):
+    with Session() as s:
+        item = Item(sku="A-1", name="Alloc", on_hand=10); s.add(item); s.flush()
+        # created out of id order: FIFO follows created_at
+        _, newest = _order(s, "O-3", item, 3, 30)
+        _, oldest = _order(s, "O-1", item, 6, 10)
+        _, middle = _order(s, "O-2", item, 6, 20)
+        assert allocate(s) == 10
+        # O-3 would fit in what O-2 leaves over, but must not jump the queue
+        assert _allocated(s, oldest, middle, newest) == [6, 4, 0]
+        _assert_reserved_matches_lines(s, item)
+        assert allocate(s) == 0  # idempotent
+
+def test_close_and_ship_release_reservations_to_waiting_lines(Session):
+    with Session() as s:
+        item = Item(sku="A-2", name="Alloc", on_hand=10); s.add(item); s.flush()
+        first, l1 = _order(s, "O-1", item, 6, 10)
+        second, l2 = _order(s, "O-2", item, 6, 20)
+        third, l3 = _order(s, "O-3", item, 3, 30)
+        allocate(s); s.commit()
+
+        close_order(s, first.id); s.commit()
+        assert _allocated(s, l1, l2, l3) == [0, 6, 3]
+        _assert_reserved_matches_lines(s, item)
+
+        pick_line(s, l2.id, 2)  # consumes its own reservation first
+        assert _allocated(s, l2) == [4]
+        ship_order(s, second.id); s.commit()  # the unpicked 4 go back to stock
+        s.refresh(item)
+        assert _allocated(s, l2, l3) == [0, 3] and item.on_hand == 8
+        _assert_reserved_matches_lines(s, item)
+
+def test_imported_order_lines_are_allocated(Session, tmp_path):
+    with Session() as s:
+        s.add(Item(sku="A-3", name="Alloc", on_hand=5)); s.commit()
+    src = tmp_path / "orders.csv"
+    src.write_text("ref,sku,qty\nIMP-1,A-3,3\nIMP-2,A-3,4\n")
+    report = import_file("orders", str(src), session_factory=Session)
+    assert report.imported == 2
+    with Session() as s:
+        item = s.scalar(select(Item).where(Item.sku=="A-3"))
+        got = dict(s.execute(select(Order.ref, OrderLine.allocated_qty).join(Order, Order.id==OrderLine.order_id)).all())
+        assert got == {"IMP-1": 3, "IMP-2": 2}
+        _assert_reserved_matches_lines(s, item)
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from wms.archive import ArchiveConflict, archive_orders
+from wms.kpi import compute_dashboard_metrics, load_kpis, rebuild_kpi_counters
+from wms.models import ARCHIVE_TABLES, Item, Order, OrderLine
+from wms.orders import close_order, ship_order
+
+OLD = datetime.utcnow() - timedelta(days=200)
+CUTOFF = datetime.utcnow() - timedelta(days=90)
+
+def _finished_order(s, ref, item, ship=False):
+    o = Order(ref=ref, status="open", created_at=OLD); s.add(o); s.flush()
+    s.add(OrderLine(order_id=o.id, item_id=item.id, qty=1)); s.flush()
+    if ship:
+        ship_order(s, o.id); s.get(Order, o.id).shipped_at = OLD + timedelta(hours=4)
+    else:
+        close_order(s, o.id)
+    s.commit()
+    return o.id
+
+def _archived_refs(s):
+    cold = ARCHIVE_TABLES["orders"]
+    return dict(s.execute(select(cold.c.id, cold.c.ref).order_by(cold.c.id)).all())
+
+@pytest.fixture
+def item(Session):
+    with Session() as s:
+        it = Item(sku="AR-1", name="Archive", on_hand=100); s.add(it); s.commit()
+        rebuild_kpi_counters(s)
+        return s.get(Item, it.id)
+
+def test_archive_keeps_kpi_counters_exact(Session, item):
+    with Session() as s:
+        _finished_order(s, "AR-SHIP", item, ship=True)
+        _finished_order(s, "AR-CLOSE", item)
+        s.add(Order(ref="AR-OPEN", status="open")); s.flush()
+        rebuild_kpi_counters(s)
+        before = load_kpis(s)
+        assert archive_orders(s, CUTOFF) == 2; s.commit()
+        kpis = load_kpis(s)
+        exact = compute_dashboard_metrics(s)  # what a rebuild from both tiers gives
+        assert {k: kpis.get(k, 0) for k in exact} == exact
+        assert kpis["orders:shipped"] == kpis["orders:closed"] == 0 and kpis["orders:open"] == 1
+        assert kpis["archived:orders:shipped"] == kpis["archived:orders:closed"] == 1
+        assert (kpis["fulfilled"], kpis["fulfill_seconds"]) == (before["fulfilled"], before["fulfill_seconds"])
+
+def test_ids_of_archived_rows_are_never_reused(Session, item):
+    with Session() as s:
+        first = _finished_order(s, "AR-1", item)  # the highest id, then archived
+        assert archive_orders(s, CUTOFF) == 1; s.commit()
+        second = _finished_order(s, "AR-2", item)
+        assert second > first
+        assert archive_orders(s, CUTOFF) == 1; s.commit()
+        assert _archived_refs(s) == {first: "AR-1", second: "AR-2"}
+        cold_lines = ARCHIVE_TABLES["order_lines"]
+        assert s.scalar(select(func.count()).select_from(cold_lines)) == 2
+
+def test_interrupted_move_resumes_and_conflicts_raise(Session, item):
+    cold = ARCHIVE_TABLES["orders"]
+    with Session() as s:
+        done = _finished_order(s, "AR-DONE", item)
+        # as if the archive commit landed and the main one did not
+        s.execute(insert(cold).from_select([c.name for c in cold.columns],
+                                           select(*Order.__table__.c).where(Order.id==done)))
+        s.commit()
+        assert archive_orders(s, CUTOFF) == 1; s.commit()
+        assert _archived_refs(s) == {done: "AR-DONE"} and s.get(Order, done) is None
+
+        clash = _finished_order(s, "AR-CLASH", item)
+        s.execute(insert(cold).values(id=clash, ref="SOMETHING-ELSE", status="closed")); s.commit()
+        with pytest.raises(ArchiveConflict):
+            archive_orders(s, CUTOFF)
+        s.rollback()
+        assert _archived_refs(s)[clash] == "SOMETHING-ELSE" and s.get(Order, clash) is not None
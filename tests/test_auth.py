@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from wms import auth
+from wms.models import User
+
+@pytest.fixture
+def picker(Session):
+    with Session() as s:
+        u = User(username="picker", role="picker"); u.set_password("picker123"); s.add(u); s.commit()
+        return auth.get_user(s, u.id)
+
+def test_handles_are_single_use(Session, picker):
+    with Session() as s:
+        sid, handle = auth.start_session(s, picker)
+        user, resumed_sid, fresh = auth.resume_session(s, handle)
+        assert (user.id, resumed_sid) == (picker.id, sid) and fresh != handle
+        assert auth.resume_session(s, handle) is None  # a URL from history or a copied link
+        assert auth.resume_session(s, fresh)[1] == sid
+
+def test_sessions_expire_and_touch_renews(Session, picker):
+    with Session() as s:
+        _, handle = auth.start_session(s, picker, ttl=0)
+        assert auth.resume_session(s, handle) is None
+        sid, handle = auth.start_session(s, picker)
+        fresh = auth.touch_session(s, sid)
+        assert fresh and auth.resume_session(s, handle) is None
+        assert auth.resume_session(s, fresh) is not None
+        expired_sid, _ = auth.start_session(s, picker, ttl=0)
+        assert auth.touch_session(s, expired_sid) is None
+
+def test_logout_ends_only_its_own_session(Session, picker):
+    with Session() as s:
+        mine, _ = auth.start_session(s, picker)
+        _, other = auth.start_session(s, picker)  # same shared account on another scanner
+        auth.end_session(s, mine)
+        assert auth.touch_session(s, mine) is None
+        assert auth.resume_session(s, other) is not None
+
+def test_revoking_a_user_ends_all_sessions(Session, picker):
+    with Session() as s:
+        sid, a = auth.start_session(s, picker)
+        _, b = auth.start_session(s, picker)
+        auth.revoke_user_sessions(s, picker.id)
+        assert auth.get_user(s, picker.id).token_gen == picker.token_gen + 1
+        assert auth.resume_session(s, a) is None and auth.resume_session(s, b) is None
+        assert auth.touch_session(s, sid) is None
+
+def test_verify_password_rejects_when_queue_is_full(Session, picker, monkeypatch):
+    with Session() as s:
+        pw_hash = s.get(User, picker.id).password_hash
+    assert auth.verify_password(pw_hash, "picker123")
+    monkeypatch.setattr(auth, "_slots", threading.BoundedSemaphore(1))
+    auth._slots.acquire()  # the queue is full
+    with pytest.raises(auth.AuthBusy):
+        auth.verify_password(pw_hash, "picker123")
@@ -0,0 +1,7 @@
+from wms import contention
+
+def test_concurrent_picks_conserve_stock(tmp_path):
+    # more picks than stock, so some are rejected while threads race for the last units
+    res = contention.run(threads=8, picks=60, items=2, stock=200, path=str(tmp_path / "contention.db"))
+    assert res["failures"] == []
+    assert res["picked"] == 2 * 200 and res["rejected"] > 0
@@ -0,0 +1,52 @@
+from sqlalchemy import func, select
+
+from wms import ledger
+from wms.ledger import reconcile, record_opening_balances, stock_at, take_snapshot, to_ts
+from wms.models import InventoryMovement, Item, Order, OrderLine, Receipt, ReceiptLine
+from wms.stock import adjust_stock, pick_line, receive_lines, reverse_movement
+
+def _assert_ledger_matches_on_hand(s):
+    assert reconcile(s) == []
+    totals = dict(s.execute(select(InventoryMovement.item_id, func.sum(InventoryMovement.qty))
+                            .group_by(InventoryMovement.item_id)).all())
+    assert totals == dict(s.execute(select(Item.id, Item.on_hand)).all())
+
+def test_ledger_sum_equals_on_hand_after_every_mutation(Session):
+    with Session() as s:
+        a, b = Item(sku="L-1", name="Ledger A", on_hand=20), Item(sku="L-2", name="Ledger B", on_hand=5)
+        s.add_all([a, b]); s.flush()
+        record_opening_balances(s)
+        o = Order(ref="L-ORD", status="open"); s.add(o); s.flush()
+        ol = OrderLine(order_id=o.id, item_id=a.id, qty=4); s.add(ol)
+        r = Receipt(ref="L-RCPT", status="open"); s.add(r); s.flush()
+        rl = ReceiptLine(receipt_id=r.id, item_id=b.id, qty=10); s.add(rl)
+        s.commit()
+        _assert_ledger_matches_on_hand(s)
+
+        pick_line(s, ol.id, 3); s.commit()
+        _assert_ledger_matches_on_hand(s)
+        receive_lines(s, {rl.id: 7}); s.commit()
+        _assert_ledger_matches_on_hand(s)
+        adjust_stock(s, a.id, -2); adjust_stock(s, b.id, 4); s.commit()
+        _assert_ledger_matches_on_hand(s)
+        pick_id = s.scalar(select(InventoryMovement.id).where(InventoryMovement.kind==ledger.PICK))
+        reverse_movement(s, pick_id); s.commit()
+        _assert_ledger_matches_on_hand(s)
+        s.refresh(a); s.refresh(b)
+        assert (a.on_hand, b.on_hand) == (20 - 3 - 2 + 3, 5 + 7 + 4)
+
+def test_stock_at_after_snapshot_counts_later_movements(Session):
+    with Session() as s:
+        item = Item(sku="L-3", name="Ledger C", on_hand=10); s.add(item); s.flush()
+        record_opening_balances(s); s.commit()
+        assert take_snapshot(s) == 1; s.commit()
+        assert take_snapshot(s) == 0  # nothing moved since
+        adjust_stock(s, item.id, 5); s.commit()
+        ledger.record(s, [(item.id, ledger.ADJUST, 1, None)], ts=to_ts() + 3600)  # future-dated
+        s.execute(Item.__table__.update().values(on_hand=Item.on_hand + 1)); s.commit()
+        assert take_snapshot(s) == 1; s.commit()
+        # the snapshot covers every movement up to its last_movement_id, whatever their ts
+        assert stock_at(s, to_ts() + 7200, [item.id]) == {item.id: 16}
+        adjust_stock(s, item.id, -4); s.commit()
+        assert stock_at(s, to_ts() + 7200, [item.id]) == {item.id: 12}
+        _assert_ledger_matches_on_hand(s)
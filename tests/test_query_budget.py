@@ -0,0 +1,49 @@
+from sqlalchemy.orm import sessionmaker
+
+from wms import catalog
+from wms.db import QueryCounter, make_engine
+from wms.kpi import rebuild_kpi_counters
+from wms.migrations import migrate
+from wms.models import Item, Order, OrderLine
+from wms.queries import ORDERS_PAGE_QUERY_BUDGET, ORDERS_PAGE_SIZE, count_orders, load_item_options, load_orders_page
+
+N_ORDERS = ORDERS_PAGE_SIZE * 4 + 2  # open orders span more than one page too
+
+def _orders_page(Session, status=None, after=None):
+    # the DB work of one Orders page render (app.page_orders)
+    with Session() as s:
+        total = count_orders(s, status)
+        page = load_orders_page(s, status=status, after=after)
+        load_item_options(s)
+        for o in page.rows:  # what the order expanders read; a lazy load here is an N+1
+            [(ln.qty, ln.item.sku) for ln in o.lines]
+    return total, page
+
+def test_orders_page_stays_within_query_budget(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'budget.db'}")
+    migrate(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, future=True)
+    with Session() as s:
+        items = [Item(sku=f"B-{i}", name=f"Budget {i}", on_hand=10) for i in range(5)]
+        s.add_all(items); s.flush()
+        for n in range(N_ORDERS):
+            o = Order(ref=f"B-ORD-{n}", status="open" if n % 2 else "packed"); s.add(o); s.flush()
+            s.add_all([OrderLine(order_id=o.id, item_id=it.id, qty=1) for it in items])
+        s.commit()
+        rebuild_kpi_counters(s)
+    catalog.invalidate()
+    try:
+        for status, expected in ((None, N_ORDERS), ("open", N_ORDERS // 2)):
+            after, seen = None, 0
+            while True:  # the first render also reloads the catalog and stock caches
+                with QueryCounter(engine) as qc:
+                    total, page = _orders_page(Session, status, after)
+                assert qc.count <= ORDERS_PAGE_QUERY_BUDGET, f"status={status}, page after {after}: {qc.count} queries"
+                seen += len(page.rows)
+                after = page.next_key
+                if after is None:
+                    break
+            assert total == seen == expected
+    finally:
+        catalog.invalidate()
+        engine.dispose()
@@ -0,0 +1 @@
+"""Data layer and warehouse services shared by the Streamlit app and tools."""
@@ -0,0 +1,67 @@
+"""Stock allocation: reserve on-hand stock for open order lines, oldest order first.
+
+Each OrderLine carries allocated_qty (reserved but not yet picked) and each Item
+carries reserved (the sum over its open lines), so available-to-promise is
+on_hand - reserved. Allocation is one set-based pass: a window function computes
+the running demand per item in FIFO order and grants whatever stock is left, with
+no skipping ahead of an older, unfilled line.
+"""
+from sqlalchemy import text, bindparam
+
+_GRANTS = """
+INSERT INTO _alloc (line_id, item_id, qty)
+SELECT id, item_id, MIN(need, avail - (cum - need))
+FROM (
+    SELECT ol.id, ol.item_id, ol.qty - ol.picked_qty - ol.allocated_qty AS need,
+           SUM(ol.qty - ol.picked_qty - ol.allocated_qty) OVER (
+               PARTITION BY ol.item_id ORDER BY o.created_at, o.id, ol.id ROWS UNBOUNDED PRECEDING) AS cum,
+           i.on_hand - i.reserved AS avail
+    FROM order_lines ol
+    JOIN orders o ON o.id = ol.order_id
+    JOIN items i ON i.id = ol.item_id
+    WHERE o.status IN ('open', 'picking') AND ol.qty - ol.picked_qty - ol.allocated_qty > 0 {item_filter}
+)
+WHERE avail - (cum - need) > 0
+"""
+
+def allocate(session, item_ids=None):
+    """Allocate available stock to unfilled open lines (all items, or just item_ids); returns units reserved."""
+    if item_ids is not None:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return 0
+    session.execute(text("CREATE TEMP TABLE IF NOT EXISTS _alloc (line_id INTEGER PRIMARY KEY, item_id INTEGER, qty INTEGER)"))
+    session.execute(text("DELETE FROM _alloc"))
+    if item_ids is None:
+        session.execute(text(_GRANTS.format(item_filter="")))
+    else:
+        stmt = text(_GRANTS.format(item_filter="AND ol.item_id IN :ids")).bindparams(bindparam("ids", expanding=True))
+        session.execute(stmt, {"ids": item_ids})
+    # IN (subquery) rather than UPDATE ... FROM _alloc: SQLite then seeks order_lines by rowid instead of scanning it
+    session.execute(text("""UPDATE order_lines SET allocated_qty = allocated_qty + (SELECT qty FROM _alloc WHERE line_id = order_lines.id)
+                            WHERE id IN (SELECT line_id FROM _alloc)"""))
+    session.execute(text("""UPDATE items SET reserved = reserved + t.qty
+                            FROM (SELECT item_id, SUM(qty) AS qty FROM _alloc GROUP BY item_id) t
+                            WHERE items.id = t.item_id"""))
+    return session.scalar(text("SELECT COALESCE(SUM(qty), 0) FROM _alloc"))
+
+def release_order(session, order_id):
+    """Return an order's unpicked reservations to stock (ship/close); returns the ids of the items released.
+
+    The caller re-runs allocate() for those items once the order has left open/picking,
+    so older waiting lines get the stock in the same transaction.
+    """
+    item_ids = session.scalars(text("SELECT DISTINCT item_id FROM order_lines WHERE order_id = :o AND allocated_qty > 0"),
+                               {"o": order_id}).all()
+    if item_ids:
+        session.execute(text("""UPDATE items SET reserved = reserved - t.qty
+                                FROM (SELECT item_id, SUM(allocated_qty) AS qty FROM order_lines
+                                      WHERE order_id = :o AND allocated_qty > 0 GROUP BY item_id) t
+                                WHERE items.id = t.item_id"""), {"o": order_id})
+        session.execute(text("UPDATE order_lines SET allocated_qty = 0 WHERE order_id = :o"), {"o": order_id})
+    return item_ids
+
+def rebuild_reservations(session):
+    """Recompute Item.reserved from line allocations (repairs drift after manual edits)."""
+    session.execute(text("""UPDATE items SET reserved = COALESCE((
+                                SELECT SUM(ol.allocated_qty) FROM order_lines ol WHERE ol.item_id = items.id), 0)"""))
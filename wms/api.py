@@ -0,0 +1,297 @@
+"""Headless JSON/HTTP API for RF scanners.
+
+A threaded stdlib HTTP server that calls the same services as the Streamlit pages
+(wms.stock, wms.orders) without re-running a UI script per scan:
+
+    WMS_API_TOKEN=... python -m wms.api --host 0.0.0.0 --port 8502 --pool 32
+
+    GET  /health
+    GET  /items/<barcode>                         item by barcode (or SKU) with stock
+    GET  /orders/<ref>                            order with lines, bins and remaining qty (archived too)
+    POST /receipt-lines/<id>/receive  {"qty": n}
+    POST /order-lines/<id>/pick       {"qty": n}  (qty defaults to 1 scan = 1 unit)
+    POST /orders/<id>/ship            {"carrier": "...", "tracking_no": "..."}
+    GET  /export/<name>.<csv|parquet>[?q=...&status=...]   streamed table export (wms.export)
+
+Connections are keep-alive (HTTP/1.1). DB access goes through a fixed-size pool;
+lookups are Core statements built once, so each pooled SQLite connection reuses
+its prepared statement on the unique barcode/SKU indexes. SQLite has a single
+writer, so writes are serialized in-process rather than contending for the file
+lock. Exports are sent with chunked transfer encoding as the cursor produces them.
+Set WMS_API_TOKEN to require "Authorization: Bearer <token>". Without it the server
+only binds to a loopback address: picks, receipts, shipments and exports are otherwise
+open to anyone on the network.
+"""
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import re
+import sys
+import threading
+from urllib.parse import parse_qs, unquote, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import select, bindparam
+from sqlalchemy.orm import sessionmaker
+
+from wms.db import DB_URL, make_engine, run_transaction
+from wms.export import FORMATS, ExportError, file_name, iter_export
+from wms.models import ARCHIVE_TABLES, Item, Order, OrderLine
+from wms.orders import OrderError, ship_order
+from wms.stock import StockError, pick_line, receive_lines
+
+DEFAULT_PORT = 8502
+DEFAULT_POOL = 16
+MAX_BODY = 64 * 1024
+# Every SQLite call releases the GIL; with hundreds of request threads the writer
+# then waits up to the interpreter switch interval (5 ms) to get it back, once per
+# statement. A shorter interval keeps that hand-off cost well under the scan budget.
+SWITCH_INTERVAL = 0.0005
+
+_EXPORT_PATH = re.compile(r"/export/(\w+)\.(\w+)")
+
+_ITEM_COLS = (Item.id, Item.sku, Item.name, Item.barcode, Item.bin_location, Item.on_hand, Item.reserved)
+_BY_BARCODE = select(*_ITEM_COLS).where(Item.barcode==bindparam("code"))
+_BY_SKU = select(*_ITEM_COLS).where(Item.sku==bindparam("code"))
+
+def _order_lookup(orders, lines):
+    by_ref = (select(orders.c.id, orders.c.ref, orders.c.customer, orders.c.status)
+              .where(orders.c.ref==bindparam("ref")).order_by(orders.c.id.desc()).limit(1))
+    order_lines = (select(lines.c.id, Item.sku, Item.name, Item.barcode, Item.bin_location,
+                          lines.c.qty, lines.c.picked_qty, lines.c.allocated_qty)
+                   .join(Item, Item.id==lines.c.item_id).where(lines.c.order_id==bindparam("oid"))
+                   .order_by(Item.bin_location, lines.c.id))
+    return by_ref, order_lines
+
+# Hot tables first; finished orders may have moved to the archive (wms.archive).
+_ORDER_LOOKUPS = [(False, *_order_lookup(Order.__table__, OrderLine.__table__)),
+                  (True, *_order_lookup(ARCHIVE_TABLES["orders"], ARCHIVE_TABLES["order_lines"]))]
+
+class BadRequest(ValueError):
+    pass
+
+def _item_json(row):
+    iid, sku, name, barcode, bin_location, on_hand, reserved = row
+    return {"id": iid, "sku": sku, "name": name, "barcode": barcode, "bin": bin_location,
+            "on_hand": on_hand or 0, "reserved": reserved or 0, "available": (on_hand or 0) - (reserved or 0)}
+
+def _qty(body, default=None):
+    qty = body.get("qty", default)
+    if isinstance(qty, bool) or not isinstance(qty, int) or qty <= 0:
+        raise BadRequest("qty must be a positive integer")
+    return qty
+
+class ScannerAPI:
+    """Routes and handlers, independent of the HTTP server (handle() returns (status, payload))."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine, autoflush=False, future=True)
+        self.write_lock = threading.Lock()
+        self.routes = [
+            ("GET", re.compile(r"/health"), self.health),
+            ("GET", re.compile(r"/items/([^/]+)"), self.item),
+            ("GET", re.compile(r"/orders/([^/]+)"), self.order),
+            ("POST", re.compile(r"/receipt-lines/(\d+)/receive"), self.receive),
+            ("POST", re.compile(r"/order-lines/(\d+)/pick"), self.pick),
+            ("POST", re.compile(r"/orders/(\d+)/ship"), self.ship),
+        ]
+
+    def handle(self, method, path, body):
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        allowed = False
+        for m, rx, fn in self.routes:
+            match = rx.fullmatch(path)
+            if match:
+                if m != method:
+                    allowed = True
+                    continue
+                try:
+                    return 200, fn(body, *map(unquote, match.groups()))
+                except LookupError as e:
+                    return 404, {"error": str(e)}
+                except BadRequest as e:
+                    return 400, {"error": str(e)}
+                except (StockError, OrderError) as e:
+                    return 409, {"error": str(e)}
+        return (405, {"error": "method not allowed"}) if allowed else (404, {"error": "not found"})
+
+    def export(self, path):
+        """(file name, content type, byte chunks) for GET /export/<name>.<fmt>, or None for other paths."""
+        url = urlsplit(path)
+        match = _EXPORT_PATH.fullmatch(url.path)
+        if match is None:
+            return None
+        name, fmt = match.groups()
+        args = {k: v[0] for k, v in parse_qs(url.query).items()}
+        session = self.Session()
+        try:
+            chunks = iter_export(session, name, fmt, args.get("q"), args.get("status"))
+        except ExportError:
+            session.close()
+            raise
+        def stream():
+            try:
+                yield from chunks
+            finally:
+                session.close()
+        return file_name(name, fmt), FORMATS[fmt], stream()
+
+    def _write(self, fn, *args):
+        with self.write_lock:
+            return run_transaction(fn, *args, session_factory=self.Session)
+
+    # ---------- handlers ----------
+    def health(self, body):
+        return {"ok": True}
+
+    def item(self, body, code):
+        with self.engine.connect() as conn:
+            row = conn.execute(_BY_BARCODE, {"code": code}).first() or conn.execute(_BY_SKU, {"code": code}).first()
+        if row is None:
+            raise LookupError(f"Unknown barcode {code}")
+        return _item_json(row)
+
+    def order(self, body, ref):
+        with self.engine.connect() as conn:
+            for archived, by_ref, order_lines in _ORDER_LOOKUPS:
+                o = conn.execute(by_ref, {"ref": ref}).first()
+                if o is not None:
+                    break
+            else:
+                raise LookupError(f"Unknown order {ref}")
+            lines = conn.execute(order_lines, {"oid": o.id}).all()
+        return {"id": o.id, "ref": o.ref, "customer": o.customer, "status": o.status, "archived": archived,
+                "lines": [{"id": lid, "sku": sku, "name": name, "barcode": bc, "bin": b, "qty": q,
+                           "picked": p, "allocated": a, "remaining": q - p}
+                          for lid, sku, name, bc, b, q, p, a in lines]}
+
+    def receive(self, body, line_id):
+        return {"received": self._write(receive_lines, {int(line_id): _qty(body)})}
+
+    def pick(self, body, line_id):
+        return {"picked": self._write(pick_line, int(line_id), _qty(body, 1))}
+
+    def ship(self, body, order_id):
+        return {"status": self._write(ship_order, int(order_id), body.get("carrier"), body.get("tracking_no"))}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid the delayed-ACK stall
+    api = None
+    token = None
+    verbose = False
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, filename, content_type, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:  # headers are out; all we can do is cut the response short
+            self.log_error("export %s failed: %r", self.path, e)
+            self.close_connection = True
+        finally:
+            chunks.close()
+
+    def _dispatch(self, method):
+        if self.token:
+            auth = self.headers.get("Authorization", "")
+            if not hmac.compare_digest(auth.encode(), f"Bearer {self.token}".encode()):
+                self.close_connection = True
+                return self._send(401, {"error": "unauthorized"})
+        body = {}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            return self._send(413, {"error": "body too large"})
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                return self._send(400, {"error": "invalid JSON"})
+            if not isinstance(body, dict):
+                return self._send(400, {"error": "expected a JSON object"})
+        if method == "GET" and self.path.startswith("/export/"):
+            try:
+                export = self.api.export(self.path)
+            except ExportError as e:
+                return self._send(400, {"error": str(e)})
+            if export is not None:
+                return self._stream(*export)
+        try:
+            status, payload = self.api.handle(method, self.path, body)
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, self.path, e)
+            status, payload = 500, {"error": "internal error"}
+        self._send(status, payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, fmt, *args):
+        if self.verbose:
+            super().log_message(fmt, *args)
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog for bursts of handheld connections
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:  # any other host name
+        return False
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, pool=DEFAULT_POOL, url=DB_URL, token=None, verbose=False):
+    """Raises ValueError for a non-loopback host without a token."""
+    if not token and not is_loopback(host):
+        raise ValueError(f"refusing to serve on {host} without WMS_API_TOKEN; the API would be unauthenticated")
+    engine = make_engine(url, pool_size=pool, max_overflow=0, pool_timeout=30)
+    handler = type("Handler", (_Handler,), {"api": ScannerAPI(engine), "token": token, "verbose": verbose})
+    return _Server((host, port), handler)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="JSON/HTTP API for RF scanners.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--pool", type=int, default=DEFAULT_POOL, help="DB connection pool size")
+    ap.add_argument("--verbose", action="store_true", help="log every request")
+    args = ap.parse_args(argv)
+    token = os.environ.get("WMS_API_TOKEN") or None
+    if not token and not is_loopback(args.host):
+        ap.error(f"--host {args.host} needs WMS_API_TOKEN set; without it only loopback addresses are allowed")
+    from wms.bootstrap import ensure_db
+    ensure_db()
+    sys.setswitchinterval(SWITCH_INTERVAL)
+    server = make_server(args.host, args.port, args.pool, token=token, verbose=args.verbose)
+    print(f"WMS scanner API on http://{args.host}:{args.port} (pool {args.pool})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Hot/cold tiering: move finished orders and receipts to the archive database.
+
+Shipped/closed orders (with their lines and shipments) and received receipts (with
+lines) whose last activity is older than --days are copied into the attached archive
+database (see wms.db.archive_path) and deleted from the operational tables, a batch
+per transaction so pickers are never locked out for long:
+
+    python -m wms.archive run --days 90 [--batch 500] [--vacuum]
+    python -m wms.archive status
+
+Reporting reads both tiers: the KPI counters (wms.kpi), the history exports
+(wms.export) and order lookups in the scanner API. Per-status order counters move to
+archived:orders:<status> in the same transaction as the rows, so the Orders page
+totals stay exact. Orders still in a released wave are left alone.
+
+The tiered tables use AUTOINCREMENT ids (migration 8), so an archived id is never
+handed to a new row and the copy is a plain INSERT that fails on a key clash.
+SQLite commits an attached database separately in WAL mode, so a crash mid-batch can
+leave rows in both tiers; the next run skips rows already archived unchanged, finishes
+the move, and raises ArchiveConflict for a row that differs from its archived copy.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+
+from wms.kpi import bump_kpi
+from wms.models import ARCHIVE_TABLES, Order, OrderLine, Receipt, ReceiptLine, Shipment, Wave, WaveOrder, archive_metadata
+
+DEFAULT_DAYS = 90
+DEFAULT_BATCH = 500
+ORDER_STATUSES_DONE = ("shipped", "closed")
+
+class ArchiveConflict(ValueError):
+    pass
+
+def ensure_archive(bind):
+    """Create the archive tables (and indexes) in the attached database if missing."""
+    archive_metadata.create_all(bind=bind)
+
+def _move(session, hot, key, ids):
+    """Copy hot rows whose key is in ids to the archive table of the same name, then delete them.
+
+    Rows already in the archive (a batch interrupted between the two commits) are skipped when
+    identical; any other id clash raises ArchiveConflict rather than overwriting archived data.
+    """
+    cold = ARCHIVE_TABLES[hot.name]
+    names = [c.name for c in cold.columns]
+    rows = select(*[hot.c[n] for n in names]).where(hot.c[key].in_(ids))
+    copied = set(session.scalars(select(cold.c.id).where(cold.c.id.in_(select(hot.c.id).where(hot.c[key].in_(ids))))))
+    if copied:
+        same = set(session.scalars(select(rows.intersect(select(*cold.c).where(cold.c.id.in_(copied))).subquery().c.id)))
+        if copied - same:
+            raise ArchiveConflict(f"{hot.name} ids {sorted(copied - same)} differ from their archived rows")
+        rows = rows.where(hot.c.id.not_in(copied))
+    session.execute(insert(cold).from_select(names, rows))
+    session.execute(delete(hot).where(hot.c[key].in_(ids)))
+
+def archive_orders(session, cutoff, batch=DEFAULT_BATCH):
+    """Move up to batch finished orders last active before cutoff (caller commits); returns the count."""
+    in_wave = select(WaveOrder.order_id).join(Wave, Wave.id==WaveOrder.wave_id).where(Wave.status!="picked")
+    ids = session.scalars(select(Order.id)
+                          .where(Order.status.in_(ORDER_STATUSES_DONE),
+                                 func.coalesce(Order.shipped_at, Order.created_at) < cutoff,
+                                 Order.id.not_in(in_wave))
+                          .order_by(Order.id).limit(batch)).all()
+    if not ids:
+        return 0
+    for status, n in session.execute(select(Order.status, func.count(Order.id))
+                                      .where(Order.id.in_(ids)).group_by(Order.status)).all():
+        bump_kpi(session, f"orders:{status}", -n)
+        bump_kpi(session, f"archived:orders:{status}", n)
+    _move(session, OrderLine.__table__, "order_id", ids)
+    _move(session, Shipment.__table__, "order_id", ids)
+    _move(session, Order.__table__, "id", ids)
+    return len(ids)
+
+def archive_receipts(session, cutoff, batch=DEFAULT_BATCH):
+    """Move up to batch received receipts created before cutoff (caller commits); returns the count."""
+    ids = session.scalars(select(Receipt.id).where(Receipt.status=="received", Receipt.created_at < cutoff)
+                          .order_by(Receipt.id).limit(batch)).all()
+    if ids:
+        _move(session, ReceiptLine.__table__, "receipt_id", ids)
+        _move(session, Receipt.__table__, "id", ids)
+    return len(ids)
+
+def run(days=DEFAULT_DAYS, batch=DEFAULT_BATCH, pause=0.0, now=None):
+    """Archive everything eligible, one batch per transaction; returns {"orders": n, "receipts": n}."""
+    from wms.db import engine, run_transaction
+    ensure_archive(engine)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    moved = {}
+    for kind, fn in (("orders", archive_orders), ("receipts", archive_receipts)):
+        moved[kind] = 0
+        while True:
+            n = run_transaction(fn, cutoff, batch)
+            moved[kind] += n
+            if n < batch:
+                break
+            time.sleep(pause)
+    return moved
+
+def status(session):
+    """[(table, hot rows, archived rows)] for the tiered tables."""
+    out = []
+    for name, cold in ARCHIVE_TABLES.items():
+        hot = Order.metadata.tables[name]
+        out.append((name, session.scalar(select(func.count()).select_from(hot)),
+                    session.scalar(select(func.count()).select_from(cold))))
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Move finished orders and receipts to the archive database.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("--days", type=int, default=DEFAULT_DAYS, help="archive what finished more than this many days ago")
+    r.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="orders/receipts per transaction")
+    r.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    r.add_argument("--vacuum", action="store_true", help="reclaim the freed space in the main database afterwards")
+    sub.add_parser("status")
+    args = ap.parse_args(argv)
+
+    from wms.bootstrap import ensure_db
+    from wms.db import SessionLocal, engine
+    ensure_db()
+    if args.cmd == "run":
+        t0 = time.perf_counter()
+        moved = run(args.days, args.batch, args.pause)
+        print(f"archived {moved['orders']} orders, {moved['receipts']} receipts in {time.perf_counter() - t0:.1f}s")
+        if args.vacuum:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM main")
+    with SessionLocal() as s:
+        for name, hot, cold in status(s):
+            print(f"{name:14} hot {hot:>10,}   archived {cold:>10,}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Authentication: pooled password verification, server-side sessions, cached users.
+
+Password hashes are deliberately slow to check. Verification runs on a small shared
+thread pool: hashlib releases the GIL, so other sessions keep rerunning, and a
+login storm queues rather than occupying every core. At most VERIFY_QUEUE checks
+wait per worker; beyond that, or after the caller's timeout, a login fails with
+AuthBusy ("try again") instead of piling up hashes nobody is waiting for.
+
+A successful login starts a session: a row in auth_sessions whose id stays in the
+server-side Streamlit session state. The URL (?session=...) carries only a random
+resume handle, stored hashed, so a reload or reconnect resumes without re-checking
+the password. A handle is single-use: resume_session swaps it for a new one, and the
+app swaps it again every SESSION_TTL / 2 while in use (touch_session), so a URL from
+history or a copied link stops working at the next swap. Sessions expire after
+SESSION_TTL without use. Logout ends only its own session (end_session); password
+resets and role changes bump users.token_gen and end all of the user's sessions
+(revoke_user_sessions). Roles always come from the user cache.
+
+User lookups go through a per-process TTL cache. page_users invalidates it on every
+change; other processes see changes within USER_TTL seconds.
+"""
+import hashlib
+import os
+import secrets
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from sqlalchemy import delete, select, update
+from werkzeug.security import check_password_hash
+
+from wms.models import AuthSession, User
+
+# Half the cores by default, leaving the rest for page reruns during a login storm.
+HASH_WORKERS = int(os.environ.get("WMS_AUTH_WORKERS") or max(1, (os.cpu_count() or 2) // 2))
+VERIFY_QUEUE = 8  # waiting checks per worker before logins are turned away
+SESSION_TTL = 2 * 3600  # idle timeout; renewed while in use
+USER_TTL = 60.0
+
+UserInfo = namedtuple("UserInfo", "id username role created_at token_gen")
+
+class AuthBusy(RuntimeError):
+    """Password checks are backed up; the caller should ask the user to try again."""
+
+_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="wms-auth")
+_slots = threading.BoundedSemaphore(HASH_WORKERS * (1 + VERIFY_QUEUE))
+_lock = threading.Lock()
+_users = {}          # user id -> (expires_at, UserInfo or None)
+_user_list = [0.0, None]
+
+def _digest(handle):
+    return hashlib.sha256(handle.encode()).hexdigest()
+
+def _info(session, u):
+    return UserInfo(u.id, u.username, u.role, u.created_at, u.token_gen)
+
+def verify_password(password_hash, password, timeout=30):
+    """check_password_hash on the shared verify pool (blocks only the calling session).
+
+    Raises AuthBusy when the queue is full or the check does not finish within timeout;
+    a check still queued by then is cancelled.
+    """
+    if not _slots.acquire(blocking=False):
+        raise AuthBusy("too many sign-ins at once")
+    future = _pool.submit(check_password_hash, password_hash, password)
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise AuthBusy("password check timed out") from None
+
+def authenticate(session, username, password):
+    """UserInfo for valid credentials, else None; raises AuthBusy under a login storm."""
+    u = session.execute(select(User).where(User.username==username)).scalar_one_or_none()
+    if u is None or not verify_password(u.password_hash, password):
+        return None
+    info = _info(session, u)
+    with _lock:
+        _users[u.id] = (time.monotonic() + USER_TTL, info)
+    return info
+
+def get_user(session, user_id):
+    """Cached UserInfo (None if the user no longer exists)."""
+    hit = _users.get(user_id)
+    if hit is not None and hit[0] > time.monotonic():
+        return hit[1]
+    u = session.get(User, user_id)
+    info = _info(session, u) if u is not None else None
+    with _lock:
+        _users[user_id] = (time.monotonic() + USER_TTL, info)
+    return info
+
+def list_users(session):
+    """All users by username, cached like get_user."""
+    expires, users = _user_list
+    if users is not None and expires > time.monotonic():
+        return users
+    users = [_info(session, u) for u in session.execute(select(User).order_by(User.username)).scalars()]
+    with _lock:
+        _user_list[:] = [time.monotonic() + USER_TTL, users]
+    return users
+
+def invalidate(user_id=None):
+    """Forget cached users (one, or all); call after creating, editing or deleting users."""
+    with _lock:
+        if user_id is None:
+            _users.clear()
+        else:
+            _users.pop(user_id, None)
+        _user_list[:] = [0.0, None]
+
+def start_session(session, user, ttl=SESSION_TTL):
+    """Record a new session for user and drop expired ones; returns (session id, URL handle). Commits."""
+    now = int(time.time())
+    session.execute(delete(AuthSession).where(AuthSession.expires_at <= now))
+    handle = secrets.token_urlsafe(32)
+    row = AuthSession(user_id=user.id, token_gen=user.token_gen, handle=_digest(handle), expires_at=now + ttl)
+    session.add(row)
+    session.commit()
+    return row.id, handle
+
+def resume_session(session, handle, ttl=SESSION_TTL):
+    """(UserInfo, session id, new handle) for a live handle, which is used up; else None. Commits."""
+    if not handle:
+        return None
+    row = session.execute(select(AuthSession.id, AuthSession.user_id, AuthSession.token_gen)
+                          .where(AuthSession.handle==_digest(handle), AuthSession.expires_at > int(time.time()))).first()
+    if row is None:
+        return None
+    user = get_user(session, row.user_id)
+    if user is None or user.token_gen != row.token_gen:
+        return None
+    # the old handle in the WHERE clause: of two tabs presenting it, only one wins
+    fresh = secrets.token_urlsafe(32)
+    res = session.execute(update(AuthSession).where(AuthSession.id==row.id, AuthSession.handle==_digest(handle))
+                          .values(handle=_digest(fresh), expires_at=int(time.time()) + ttl))
+    session.commit()
+    return (user, row.id, fresh) if res.rowcount else None
+
+def touch_session(session, sid, ttl=SESSION_TTL):
+    """Extend a live session and swap its handle; returns the new handle, or None if it ended. Commits."""
+    handle, now = secrets.token_urlsafe(32), int(time.time())
+    res = session.execute(update(AuthSession).where(AuthSession.id==sid, AuthSession.expires_at > now)
+                          .values(handle=_digest(handle), expires_at=now + ttl))
+    session.commit()
+    return handle if res.rowcount else None
+
+def end_session(session, sid):
+    """Sign-out: end this session only; the user's other sessions stay. Commits."""
+    session.execute(delete(AuthSession).where(AuthSession.id==sid))
+    session.commit()
+
+def revoke_user_sessions(session, user_id):
+    """End every session of user_id (password reset, role change). Commits."""
+    session.execute(update(User).where(User.id==user_id).values(token_gen=User.token_gen + 1))
+    session.execute(delete(AuthSession).where(AuthSession.user_id==user_id))
+    session.commit()
+    invalidate(user_id)
@@ -0,0 +1,252 @@
+"""Reproducible benchmarks for the Streamlit pages and the stock transactions.
+
+Builds (or reuses) a synthetic database at a scale factor, drives every page
+headlessly through streamlit.testing's AppTest, and times pick/receive transactions.
+For each case it records latency percentiles, SQL statements per run and peak
+Python memory, and writes them to a JSON file that can be compared across commits:
+
+    python -m wms.bench run --scale 0.1 --out bench/baseline.json
+    python -m wms.bench compare bench/baseline.json bench/new.json
+
+The dataset is generated once into --db (default: a file per scale factor and
+seed in the temp directory) and never written again: each run works on a scratch
+copy, set as WMS_DB_URL before any wms module opens the engine, so the transaction
+cases' writes do not leak into later runs and every commit measures the same data.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+PAGES = ["Dashboard", "Inventory", "Inbound", "Orders", "Waves", "Users (Admin)"]
+REGRESSION_RATIO = 1.25
+
+def percentile(values, pct):
+    if not values:
+        return None
+    vals = sorted(values)
+    k = (len(vals) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (k - lo)
+
+def summarize(latencies, queries, peak_bytes):
+    ms = [t * 1000.0 for t in latencies]
+    return {"runs": len(ms), "p50_ms": round(percentile(ms, 50), 2), "p95_ms": round(percentile(ms, 95), 2),
+            "p99_ms": round(percentile(ms, 99), 2), "max_ms": round(max(ms), 2),
+            "queries": max(queries) if queries else 0, "peak_kb": round(peak_bytes / 1024)}
+
+def measure(fn, runs):
+    """Time fn() runs times, then once more under tracemalloc for peak memory."""
+    from wms.db import QueryCounter
+    latencies, queries = [], []
+    for _ in range(runs):
+        with QueryCounter() as qc:
+            t0 = time.perf_counter(); fn(); latencies.append(time.perf_counter() - t0)
+        queries.append(qc.count)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return summarize(latencies, queries, peak)
+
+def _copy_db(src, dst):
+    # the backup API also picks up anything still in src's WAL
+    a, b = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        a.backup(b)
+    finally:
+        a.close(); b.close()
+
+def _generate(path, scale, seed):
+    """Generate the dataset into path (and its archive file), atomically."""
+    from sqlalchemy.orm import sessionmaker
+    from wms.bootstrap import ensure_schema, seed as seed_demo
+    from wms.datagen import generate, finish
+    from wms.db import archive_path, make_engine
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.partial{ext}"
+    for f in (tmp, archive_path(f"sqlite:///{tmp}")):
+        if os.path.exists(f):
+            os.remove(f)
+    engine = make_engine(f"sqlite:///{tmp}")
+    ensure_schema(engine)
+    with sessionmaker(bind=engine, autoflush=False, future=True)() as s:
+        generate(s, scale, seed); s.commit(); finish(s)
+        seed_demo(s)  # demo users for the login-free AppTest session
+    engine.dispose()
+    os.replace(archive_path(f"sqlite:///{tmp}"), archive_path(f"sqlite:///{path}"))
+    os.replace(tmp, path)
+
+def prepare_db(path, scale, seed):
+    """Generate the dataset into path if missing, then point WMS_DB_URL at a scratch copy of it.
+
+    Returns the copy's path; it is migrated to the current schema and deleted at exit.
+    """
+    work = os.path.join(tempfile.mkdtemp(prefix="wms-bench-"), os.path.basename(path))
+    atexit.register(shutil.rmtree, os.path.dirname(work), True)
+    os.environ["WMS_DB_URL"] = f"sqlite:///{work}"
+    from wms.bootstrap import ensure_schema, seed as seed_demo
+    from wms.db import SessionLocal, archive_path, engine
+    if not os.path.exists(path):
+        _generate(path, scale, seed)
+    _copy_db(path, work)
+    if os.path.exists(archive_path(f"sqlite:///{path}")):
+        _copy_db(archive_path(f"sqlite:///{path}"), archive_path(f"sqlite:///{work}"))
+    ensure_schema(engine)
+    with SessionLocal() as s:
+        seed_demo(s)
+    return work
+
+def bench_pages(runs, pages=PAGES):
+    from streamlit.testing.v1 import AppTest
+    results = {}
+    for page in pages:
+        at = AppTest.from_file(APP_PATH, default_timeout=600)
+        at.session_state["user_id"] = 1; at.session_state["username"] = "admin"; at.session_state["role"] = "admin"
+        at.run()
+        radio = at.sidebar.radio[0]
+        if page not in radio.options:
+            continue
+        radio.set_value(page).run()  # warm-up: imports, caches
+        if at.exception:
+            results[f"page:{page}"] = {"error": at.exception[0].message}
+            continue
+        results[f"page:{page}"] = measure(lambda: at.run(), runs)
+    return results
+
+_COLD_START = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+at.run()
+t1 = time.perf_counter()
+pandas_at_login = "pandas" in sys.modules
+at.session_state["user_id"] = 1; at.session_state["username"] = "admin"; at.session_state["role"] = "admin"
+at.run()
+print(json.dumps({"login_s": t1 - t0, "first_page_s": time.perf_counter() - t1, "pandas_at_login": pandas_at_login}))
+"""
+
+def bench_startup(runs, cold_runs=3):
+    """Cold process: login screen, then the first page after login; plus rerun overhead on a page without DB work."""
+    from streamlit.testing.v1 import AppTest
+    cold = []
+    for _ in range(cold_runs):
+        out = subprocess.run([sys.executable, "-c", _COLD_START, APP_PATH], capture_output=True, text=True, env=os.environ, check=True)
+        cold.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    results = {"startup:cold_login": {**summarize([c["login_s"] for c in cold], [], 0), "pandas_loaded": cold[-1]["pandas_at_login"]},
+               "startup:cold_first_page": summarize([c["first_page_s"] for c in cold], [], 0)}
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.session_state["user_id"] = 1; at.session_state["username"] = "admin"; at.session_state["role"] = "admin"
+    at.run()
+    at.sidebar.radio[0].set_value("Change Password").run()
+    results["startup:rerun"] = measure(lambda: at.run(), runs)
+    return results
+
+def bench_transactions(runs, seed):
+    from sqlalchemy import select
+    from wms.db import SessionLocal, run_transaction
+    from wms.models import Item, OrderLine, Order, ReceiptLine, Receipt
+    from wms.stock import StockError, pick_line, receive_lines
+    rnd = random.Random(seed)
+    with SessionLocal() as s:
+        picks = s.scalars(select(OrderLine.id).join(Order, Order.id==OrderLine.order_id)
+                          .join(Item, Item.id==OrderLine.item_id)
+                          .where(Order.status=="open", Item.on_hand - Item.reserved > runs)).all()
+        recvs = s.scalars(select(ReceiptLine.id).join(Receipt, Receipt.id==ReceiptLine.receipt_id)
+                          .where(Receipt.status=="open")).all()
+    results = {}
+    if picks:
+        def pick():
+            try:
+                run_transaction(pick_line, rnd.choice(picks), 1)
+            except StockError:
+                pass
+        results["tx:pick_line"] = measure(pick, runs)
+    if recvs:
+        results["tx:receive_lines"] = measure(lambda: run_transaction(receive_lines, {rnd.choice(recvs): 1}), runs)
+    return results
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_PATH)).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(scale, runs, seed=42, db=None, pages=PAGES):
+    db = db or os.path.join(tempfile.gettempdir(), f"wms-bench-sf{scale:g}-seed{seed}.db")
+    t0 = time.perf_counter()
+    prepare_db(db, scale, seed)
+    setup = time.perf_counter() - t0
+    results = bench_startup(runs)
+    results.update(bench_pages(runs, pages))
+    results.update(bench_transactions(runs, seed))
+    return {"meta": {"scale": scale, "runs": runs, "seed": seed, "db": db, "setup_s": round(setup, 2),
+                     "commit": git_rev(), "python": platform.python_version(),
+                     "at": datetime.utcnow().isoformat(timespec="seconds")},
+            "results": results}
+
+def compare(base, new, ratio=REGRESSION_RATIO):
+    """Lines describing each case, and the list of regressed case names."""
+    lines, regressed = [], []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        a, b = base["results"].get(name, {}), new["results"].get(name, {})
+        if "p95_ms" not in a or "p95_ms" not in b:
+            lines.append(f"{name:28} {'n/a':>10}"); continue
+        flag = ""
+        if b["p95_ms"] > a["p95_ms"] * ratio or b["queries"] > a["queries"] or b["peak_kb"] > a["peak_kb"] * ratio:
+            flag = "  REGRESSION"; regressed.append(name)
+        lines.append(f"{name:28} p95 {a['p95_ms']:>9.1f} -> {b['p95_ms']:>9.1f} ms   queries {a['queries']:>5} -> {b['queries']:>5}"
+                     f"   peak {a['peak_kb']:>7} -> {b['peak_kb']:>7} KiB{flag}")
+    return lines, regressed
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="WMS page and transaction benchmarks.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("--scale", type=float, default=0.1)
+    r.add_argument("--runs", type=int, default=20)
+    r.add_argument("--seed", type=int, default=42)
+    r.add_argument("--db", help="dataset file (generated if missing; runs use a scratch copy)")
+    r.add_argument("--pages", nargs="*", default=PAGES)
+    r.add_argument("--out", help="write results JSON here (default: stdout)")
+    c = sub.add_parser("compare")
+    c.add_argument("base"); c.add_argument("new")
+    c.add_argument("--ratio", type=float, default=REGRESSION_RATIO, help="allowed p95/memory growth factor")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compare":
+        with open(args.base) as fa, open(args.new) as fb:
+            lines, regressed = compare(json.load(fa), json.load(fb), args.ratio)
+        print("\n".join(lines))
+        return 1 if regressed else 0
+
+    report = run(args.scale, args.runs, args.seed, args.db, args.pages)
+    out = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+        for name, res in report["results"].items():
+            print(f"{name:28} " + (f"p50 {res['p50_ms']:.1f} ms  p95 {res['p95_ms']:.1f} ms  queries {res['queries']}  peak {res['peak_kb']} KiB"
+                                   if "p50_ms" in res else res.get("error", "")))
+    else:
+        print(out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
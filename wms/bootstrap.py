@@ -0,0 +1,60 @@
+from sqlalchemy import select
+
+from wms.allocation import allocate
+from wms.db import engine, SessionLocal
+from wms.kpi import rebuild_kpi_counters
+from wms.ledger import record_opening_balances
+from wms.migrations import migrate
+from wms.models import User, Item, Receipt, ReceiptLine, Order, OrderLine, KpiCounter, InventoryMovement
+
+def seed(session):
+    # Items / Receipts / Orders
+    if session.scalar(select(Item.id).limit(1)) is None:
+        items = [
+            Item(sku="SKU-001", name="Cardboard Box Small", barcode="1000001", bin_location="A1-01", reorder_point=20, on_hand=100),
+            Item(sku="SKU-002", name="Bubble Wrap 50m", barcode="1000002", bin_location="A1-02", reorder_point=10, on_hand=25),
+            Item(sku="SKU-003", name="Packing Tape", barcode="1000003", bin_location="B1-01", reorder_point=15, on_hand=60),
+        ]
+        session.add_all(items)
+        r = Receipt(ref="RCPT-001", vendor="Acme Supplies")
+        session.add(r); session.flush()
+        session.add_all([
+            ReceiptLine(receipt_id=r.id, item_id=1, qty=50),
+            ReceiptLine(receipt_id=r.id, item_id=2, qty=10),
+        ])
+        o = Order(ref="ORD-001", customer="PT Nusantara")
+        session.add(o); session.flush()
+        session.add_all([
+            OrderLine(order_id=o.id, item_id=1, qty=5),
+            OrderLine(order_id=o.id, item_id=3, qty=2),
+        ])
+        session.flush()
+        allocate(session, [1, 3])
+        session.commit()
+
+    # Demo users
+    if session.scalar(select(User.id).limit(1)) is None:
+        admin = User(username="admin", role="admin"); admin.set_password("admin123")
+        sup = User(username="supervisor", role="supervisor"); sup.set_password("super123")
+        pick = User(username="picker", role="picker"); pick.set_password("picker123")
+        session.add_all([admin, sup, pick]); session.commit()
+
+def ensure_schema(bind):
+    """Bring the schema to the latest migration; no data. Returns the versions applied."""
+    return migrate(bind)
+
+def ensure_db():
+    """Migrate, then seed and backfill derived state that is missing.
+
+    The checks look at the data, not at whether a migration ran, so a database migrated
+    with python -m wms.migrations still gets its demo users. Against a current, seeded
+    database this is a few primary-key lookups; the Streamlit app additionally runs it
+    once per process (st.cache_resource) rather than on every rerun.
+    """
+    ensure_schema(engine)
+    with SessionLocal() as s:
+        seed(s)
+        if s.get(KpiCounter, "on_hand") is None:
+            rebuild_kpi_counters(s)
+        if not s.scalar(select(InventoryMovement.id).limit(1)):
+            record_opening_balances(s); s.commit()
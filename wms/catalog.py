@@ -0,0 +1,116 @@
+"""Process-wide item catalog cache with versioned invalidation.
+
+Triggers on items bump two counters in kpi_counters: catalog_version when an item is
+added, removed or its descriptive columns change, and stock_version when on_hand or
+reserved change. Every session in the process shares one column-oriented copy of the
+catalog and rebuilds it only when the version it was built from is out of date, so
+a rerun costs one primary-key lookup instead of a full items scan.
+"""
+import threading
+from array import array
+from sqlalchemy import select, text
+
+from wms.models import Item, KpiCounter
+
+CATALOG_VERSION, STOCK_VERSION = "catalog_version", "stock_version"
+
+_BUMP = ("INSERT INTO kpi_counters (name, value) VALUES ('{name}', 1) "
+         "ON CONFLICT(name) DO UPDATE SET value = value + 1;")
+CATALOG_TRIGGER_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS items_catalog_ai AFTER INSERT ON items BEGIN {_BUMP.format(name=CATALOG_VERSION)} END",
+    f"CREATE TRIGGER IF NOT EXISTS items_catalog_ad AFTER DELETE ON items BEGIN {_BUMP.format(name=CATALOG_VERSION)} END",
+    f"""CREATE TRIGGER IF NOT EXISTS items_catalog_au AFTER UPDATE OF sku, name, barcode, bin_location, reorder_point ON items
+        BEGIN {_BUMP.format(name=CATALOG_VERSION)} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS items_stock_au AFTER UPDATE OF on_hand, reserved ON items
+        BEGIN {_BUMP.format(name=STOCK_VERSION)} END""",
+]
+
+def ensure_catalog_triggers(bind):
+    with bind.begin() as conn:
+        for ddl in CATALOG_TRIGGER_DDL:
+            conn.execute(text(ddl))
+
+class Catalog:
+    """Item attributes as parallel columns, in SKU order."""
+    __slots__ = ("version", "ids", "skus", "names", "barcodes", "bins", "reorder_points", "pos")
+
+    def __init__(self, version, rows):
+        self.version = version
+        cols = list(zip(*rows)) or [()] * 6
+        self.ids = array("q", cols[0])
+        self.skus, self.names, self.barcodes, self.bins = (list(c) for c in cols[1:5])
+        self.reorder_points = array("q", (r or 0 for r in cols[5]))
+        self.pos = {iid: i for i, iid in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+class _Cache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.catalog = None
+        self.stock = None      # (catalog_version, stock_version, on_hand array, reserved array)
+        self.options = {}      # (kind, versions) -> {label: item_id}
+
+_cache = _Cache()
+
+def _versions(session):
+    rows = dict(session.execute(select(KpiCounter.name, KpiCounter.value)
+                                .where(KpiCounter.name.in_([CATALOG_VERSION, STOCK_VERSION]))).all())
+    return rows.get(CATALOG_VERSION, 0), rows.get(STOCK_VERSION, 0)
+
+def get_catalog(session, versions=None):
+    """Shared Catalog, reloaded only when catalog_version has moved."""
+    cat_v = (versions or _versions(session))[0]
+    cat = _cache.catalog
+    if cat is not None and cat.version == cat_v:
+        return cat
+    with _cache.lock:
+        if _cache.catalog is None or _cache.catalog.version != cat_v:
+            rows = session.execute(select(Item.id, Item.sku, Item.name, Item.barcode, Item.bin_location, Item.reorder_point)
+                                   .order_by(Item.sku)).all()
+            _cache.catalog = Catalog(cat_v, rows)
+            _cache.options.clear()
+        return _cache.catalog
+
+def get_stock(session, versions=None):
+    """(catalog, on_hand, reserved) with stock columns aligned to the catalog order."""
+    versions = versions or _versions(session)
+    cat = get_catalog(session, versions)
+    stock = _cache.stock
+    if stock is None or stock[:2] != (cat.version, versions[1]):
+        with _cache.lock:
+            rows = session.execute(select(Item.id, Item.on_hand, Item.reserved)).all()
+            on_hand, reserved = array("q", bytes(8 * len(cat))), array("q", bytes(8 * len(cat)))
+            for iid, oh, rs in rows:
+                i = cat.pos.get(iid)
+                if i is not None:
+                    on_hand[i], reserved[i] = oh or 0, rs or 0
+            stock = _cache.stock = (cat.version, versions[1], on_hand, reserved)
+    return cat, stock[2], stock[3]
+
+def item_options(session, with_stock=False):
+    """Label -> item id for item pickers; labels are built once per version and shared."""
+    versions = _versions(session)
+    key = ("stock", versions) if with_stock else ("plain", versions[0])
+    opts = _cache.options.get(key)
+    if opts is not None:
+        return opts
+    if with_stock:
+        cat, on_hand, reserved = get_stock(session, versions)
+        opts = {f"{sku} — {name} (OnHand:{oh} Avail:{oh - rs})": iid
+                for iid, sku, name, oh, rs in zip(cat.ids, cat.skus, cat.names, on_hand, reserved)}
+    else:
+        cat = get_catalog(session, versions)
+        opts = {f"{sku} — {name}": iid for iid, sku, name in zip(cat.ids, cat.skus, cat.names)}
+    with _cache.lock:
+        for k in [k for k in _cache.options if k[0] == key[0]]:
+            del _cache.options[k]  # keep only the latest build of each kind
+        _cache.options[key] = opts
+    return opts
+
+def invalidate():
+    """Drop the cached catalog (tests, or after writes that bypass the triggers)."""
+    with _cache.lock:
+        _cache.catalog = _cache.stock = None
+        _cache.options.clear()
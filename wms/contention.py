@@ -0,0 +1,97 @@
+"""Multi-threaded pick contention check for the stock service.
+
+Runs many threads picking the same few items concurrently against a scratch
+SQLite file and verifies that no stock is lost or double-picked:
+
+    python -m wms.contention --threads 30 --picks 200
+
+Exits non-zero if any invariant is violated.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from sqlalchemy import select, func
+from sqlalchemy.orm import sessionmaker
+
+from wms.db import make_engine, run_transaction
+from wms.kpi import rebuild_kpi_counters, load_kpis
+from wms.ledger import record_opening_balances, reconcile
+from wms.migrations import migrate
+from wms.models import Item, Order, OrderLine
+from wms.stock import StockError, pick_line
+
+def run(threads=30, picks=200, items=3, stock=1000, qty=1, path=None):
+    path = path or os.path.join(tempfile.mkdtemp(prefix="wms-contention-"), "contention.db")
+    engine = make_engine(f"sqlite:///{path}", pool_size=threads, max_overflow=0)
+    Session = sessionmaker(bind=engine, autoflush=False, future=True)
+    migrate(engine)
+    with Session() as s:
+        s.add_all([Item(sku=f"C-{i}", name=f"Contended {i}", on_hand=stock) for i in range(items)]); s.flush()
+        item_ids = s.scalars(select(Item.id)).all()
+        line_ids = []
+        for t in range(threads):
+            o = Order(ref=f"C-ORD-{t}"); s.add(o); s.flush()
+            lines = [OrderLine(order_id=o.id, item_id=iid, qty=picks*qty) for iid in item_ids]
+            s.add_all(lines); s.flush()
+            line_ids.append([ln.id for ln in lines])
+        record_opening_balances(s)
+        s.commit()
+        rebuild_kpi_counters(s)
+
+    ok, rejected, errors = [0]*threads, [0]*threads, []
+    barrier = threading.Barrier(threads)
+
+    def worker(t):
+        barrier.wait()
+        try:
+            for n in range(picks):
+                try:
+                    run_transaction(pick_line, line_ids[t][n % items], qty, session_factory=Session)
+                    ok[t] += qty
+                except StockError:
+                    rejected[t] += 1
+        except Exception as e:  # surfaced below
+            errors.append(repr(e))
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for th in pool: th.start()
+    for th in pool: th.join()
+
+    with Session() as s:
+        on_hand = s.scalar(select(func.sum(Item.on_hand)))
+        picked = s.scalar(select(func.sum(OrderLine.picked_qty)))
+        negative = s.scalar(select(func.count(Item.id)).where(Item.on_hand < 0))
+        kpi_on_hand = load_kpis(s)["on_hand"]
+        drift = reconcile(s)
+    engine.dispose()
+
+    failures = list(errors)
+    if picked != sum(ok):
+        failures.append(f"picked_qty total {picked} != successful picks {sum(ok)}")
+    if on_hand + picked != items * stock:
+        failures.append(f"stock not conserved: on_hand {on_hand} + picked {picked} != {items * stock}")
+    if negative:
+        failures.append(f"{negative} items went negative")
+    if drift:
+        failures.append(f"{len(drift)} items differ from the movement ledger")
+    if kpi_on_hand != on_hand:
+        failures.append(f"kpi on_hand {kpi_on_hand} != items total {on_hand}")
+    return {"picked": picked, "rejected": sum(rejected), "on_hand": on_hand, "failures": failures}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--threads", type=int, default=30)
+    ap.add_argument("--picks", type=int, default=200, help="pick attempts per thread")
+    ap.add_argument("--items", type=int, default=3)
+    ap.add_argument("--stock", type=int, default=1000, help="starting on_hand per item")
+    args = ap.parse_args(argv)
+    res = run(args.threads, args.picks, args.items, args.stock)
+    print(f"picked={res['picked']} rejected={res['rejected']} on_hand={res['on_hand']}")
+    for f in res["failures"]:
+        print("FAIL:", f)
+    return 1 if res["failures"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
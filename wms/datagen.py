@@ -0,0 +1,114 @@
+"""Synthetic warehouse data at a given scale factor.
+
+SF1 is 10k items, 100k orders (about 500k lines), 10k receipts (about 50k lines)
+and a shipment per shipped/closed order. Rows are bulk-inserted with executemany in
+batches, then the derived state (ledger opening balances, KPI counters, allocation)
+is rebuilt once at the end.
+
+    WMS_DB_URL=sqlite:///bench.db python -m wms.datagen --scale 0.1
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, func
+
+from wms.allocation import allocate
+from wms.kpi import rebuild_kpi_counters
+from wms.ledger import record_opening_balances
+from wms.models import Item, Order, OrderLine, Receipt, ReceiptLine, Shipment
+
+SF1 = {"items": 10_000, "orders": 100_000, "lines_per_order": 5, "receipts": 10_000, "lines_per_receipt": 5}
+STATUS_WEIGHTS = {"open": 40, "picking": 10, "packed": 10, "shipped": 25, "closed": 15}
+BATCH = 10_000
+HISTORY_DAYS = 90
+
+def _batched(session, model, rows):
+    buf = []
+    for r in rows:
+        buf.append(r)
+        if len(buf) >= BATCH:
+            session.execute(insert(model), buf); buf = []
+    if buf:
+        session.execute(insert(model), buf)
+
+def sizes(scale):
+    return {k: max(1, int(v * scale)) if k in ("items", "orders", "receipts") else v for k, v in SF1.items()}
+
+def generate(session, scale=1.0, seed=42, now=None):
+    """Bulk-load synthetic data into an empty schema (caller's session); returns row counts."""
+    if session.scalar(select(func.count(Item.id))):
+        raise ValueError("generate() expects an empty database")
+    rnd = random.Random(seed)
+    n = sizes(scale)
+    now = now or datetime.utcnow()
+    start = now - timedelta(days=HISTORY_DAYS)
+    aisles = "ABCDEFGHJK"
+
+    _batched(session, Item, ({"id": i, "sku": f"SKU-{i:07d}", "name": f"Item {i} {rnd.choice(['Box', 'Tape', 'Wrap', 'Label', 'Pallet', 'Film'])}",
+                              "barcode": f"{800000000000 + i}", "bin_location": f"{aisles[i % len(aisles)]}{1 + (i // 10) % 40}-{1 + i % 5:02d}",
+                              "reorder_point": rnd.randint(5, 50), "on_hand": rnd.randint(0, 500), "reserved": 0}
+                             for i in range(1, n["items"] + 1)))
+
+    statuses = rnd.choices(list(STATUS_WEIGHTS), weights=list(STATUS_WEIGHTS.values()), k=n["orders"])
+    created = sorted(start + timedelta(seconds=rnd.randint(0, HISTORY_DAYS * 86400)) for _ in range(n["orders"]))
+    orders, lines, shipments = [], [], []
+    line_id = 0
+    for oid in range(1, n["orders"] + 1):
+        stt, c = statuses[oid - 1], created[oid - 1]
+        done = stt in ("packed", "shipped", "closed")
+        shipped_at = c + timedelta(hours=rnd.uniform(2, 72)) if stt in ("shipped", "closed") else None
+        orders.append({"id": oid, "ref": f"ORD-{oid:08d}", "created_at": c, "customer": f"Customer {rnd.randint(1, 5000)}",
+                       "status": stt, "picked_at": c + timedelta(hours=1) if stt != "open" else None, "shipped_at": shipped_at})
+        for iid in rnd.sample(range(1, n["items"] + 1), min(n["items"], rnd.randint(1, 2 * n["lines_per_order"] - 1))):
+            line_id += 1
+            qty = rnd.randint(1, 10)
+            picked = qty if done else (rnd.randint(0, qty) if stt == "picking" else 0)
+            lines.append({"id": line_id, "order_id": oid, "item_id": iid, "qty": qty, "picked_qty": picked, "allocated_qty": 0})
+        if shipped_at:
+            shipments.append({"order_id": oid, "carrier": rnd.choice(["JNE", "SiCepat", "J&T"]), "tracking_no": f"TRK{oid:010d}", "created_at": shipped_at})
+    _batched(session, Order, orders); _batched(session, OrderLine, lines); _batched(session, Shipment, shipments)
+    counts = {"items": n["items"], "orders": len(orders), "order_lines": len(lines), "shipments": len(shipments)}
+    del orders, lines, shipments
+
+    receipts, rlines = [], []
+    rl_id = 0
+    for rid in range(1, n["receipts"] + 1):
+        received = rnd.random() < 0.8
+        receipts.append({"id": rid, "ref": f"RCPT-{rid:08d}", "vendor": f"Vendor {rnd.randint(1, 200)}",
+                         "created_at": start + timedelta(seconds=rnd.randint(0, HISTORY_DAYS * 86400)), "status": "received" if received else "open"})
+        for iid in rnd.sample(range(1, n["items"] + 1), min(n["items"], rnd.randint(1, 2 * n["lines_per_receipt"] - 1))):
+            rl_id += 1
+            qty = rnd.randint(10, 200)
+            rlines.append({"id": rl_id, "receipt_id": rid, "item_id": iid, "qty": qty, "received_qty": qty if received else 0})
+    _batched(session, Receipt, receipts); _batched(session, ReceiptLine, rlines)
+    counts.update(receipts=len(receipts), receipt_lines=len(rlines))
+    return counts
+
+def finish(session):
+    """Rebuild derived state after a bulk load (ledger, allocation, KPIs)."""
+    record_opening_balances(session)
+    allocate(session)
+    session.commit()
+    rebuild_kpi_counters(session)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate synthetic WMS data into an empty database (see WMS_DB_URL).")
+    ap.add_argument("--scale", type=float, default=0.1, help="scale factor; 1.0 = 10k items / 100k orders")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args(argv)
+    from wms.bootstrap import ensure_schema, seed
+    from wms.db import SessionLocal, engine
+    ensure_schema(engine)
+    t0 = time.perf_counter()
+    with SessionLocal() as s:
+        counts = generate(s, args.scale, args.seed)
+        s.commit()
+        finish(s)
+        seed(s)  # demo users only; items already exist
+    print(", ".join(f"{k}={v}" for k, v in counts.items()) + f" in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import os
+import random
+import sys
+import threading
+import time
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session as _BaseSession, declarative_base, sessionmaker
+
+DB_URL = os.environ.get("WMS_DB_URL", "sqlite:///wms_streamlit.db")
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the single
+# writer; busy_timeout makes writers wait for the lock instead of failing immediately.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -32000,  # KiB
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+def _apply_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+# Finished orders and receipts move to a second SQLite file (wms.archive), attached to
+# every connection as schema "archive" so one query can read hot and cold rows.
+ARCHIVE_SCHEMA = "archive"
+
+def archive_path(url):
+    """<db>.archive<ext> beside a file database (in-memory for :memory:); WMS_ARCHIVE_DB overrides it for WMS_DB_URL."""
+    if url == DB_URL and os.environ.get("WMS_ARCHIVE_DB"):
+        return os.environ["WMS_ARCHIVE_DB"]
+    database = make_url(url).database
+    if not database or database == ":memory:":
+        return ":memory:"
+    root, ext = os.path.splitext(database)
+    return f"{root}.archive{ext or '.db'}"
+
+def make_engine(url=DB_URL, **kwargs):
+    eng = create_engine(url, echo=False, future=True, **kwargs)
+    if eng.dialect.name == "sqlite":
+        event.listen(eng, "connect", _apply_pragmas)
+        path = archive_path(url)
+        def _attach_archive(dbapi_conn, _record):
+            dbapi_conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+            dbapi_conn.execute(f"PRAGMA {ARCHIVE_SCHEMA}.journal_mode=WAL")
+        event.listen(eng, "connect", _attach_archive)
+    return eng
+
+class Session(_BaseSession):
+    """Session whose with-block is timed as a span while wms.profiling is enabled."""
+    span_factory = None  # set by wms.profiling.enable(): frame -> context manager
+
+    def __enter__(self):
+        factory = Session.span_factory
+        if factory is not None:
+            self._span = factory(sys._getframe(1))
+            self._span.__enter__()
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        try:
+            return super().__exit__(*exc)
+        finally:
+            span = self.__dict__.pop("_span", None)
+            if span is not None:
+                span.__exit__(*exc)
+
+engine = make_engine()
+SessionLocal = sessionmaker(bind=engine, class_=Session, autoflush=False, future=True)
+Base = declarative_base()
+
+LOCK_RETRIES = 6
+
+def _is_lock_error(exc):
+    msg = str(exc.orig if getattr(exc, "orig", None) else exc).lower()
+    return "locked" in msg or "busy" in msg
+
+def run_transaction(fn, *args, session_factory=None, retries=LOCK_RETRIES, **kwargs):
+    """Run fn(session, *args, **kwargs) and commit, retrying with jittered backoff while SQLite reports lock contention."""
+    factory = session_factory or SessionLocal
+    for attempt in range(retries + 1):
+        with factory() as s:
+            try:
+                result = fn(s, *args, **kwargs)
+                s.commit()
+                return result
+            except OperationalError as e:
+                s.rollback()
+                if attempt == retries or not _is_lock_error(e):
+                    raise
+        time.sleep(min(1.0, 0.01 * 2 ** attempt) * (0.5 + random.random()))
+
+class QueryCounter:
+    """Counts SQL statements this thread sends to the engine while the block runs.
+
+    Other threads (other Streamlit sessions, workers) are not counted: one listener per
+    engine, added once and never removed, bumps the counters active on the calling thread.
+    """
+    _local = threading.local()
+    _listening = set()  # ids of engines with the listener
+    _lock = threading.Lock()
+
+    def __init__(self, bind=None):
+        self.bind = bind if bind is not None else engine
+        self.count = 0
+
+    @classmethod
+    def _on_execute(cls, conn, *args):
+        for qc in getattr(cls._local, "active", ()):
+            if qc.bind is conn.engine:
+                qc.count += 1
+
+    def __enter__(self):
+        with QueryCounter._lock:
+            if id(self.bind) not in QueryCounter._listening:
+                event.listen(self.bind, "before_cursor_execute", QueryCounter._on_execute)
+                QueryCounter._listening.add(id(self.bind))
+        QueryCounter._local.__dict__.setdefault("active", []).append(self)
+        return self
+
+    def __exit__(self, *exc):
+        QueryCounter._local.active.remove(self)
@@ -0,0 +1,155 @@
+"""Streaming export of inventory, order lines and receipt lines to CSV or Parquet.
+
+    python -m wms.export inventory --out items.csv
+    python -m wms.export order_lines --format parquet --status open --out open.parquet
+    curl -H "Authorization: Bearer $WMS_API_TOKEN" localhost:8502/export/inventory.csv?q=tape
+
+Rows come straight off one DB cursor (yield_per) in chunks and each chunk is encoded
+and handed on before the next is fetched, so memory stays at one chunk however large
+the table is. No ORM objects or DataFrames are built. Inventory exports accept the
+same search text as the Inventory page; order/receipt line exports a header status.
+Order and receipt lines cover archived history too (wms.archive).
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime
+from sqlalchemy import select
+
+from wms.db import Base
+from wms.models import ARCHIVE_TABLES, Item
+from wms.search import INVENTORY_COLUMNS, search_filter
+
+DEFAULT_CHUNKSIZE = 5000
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+class ExportError(ValueError):
+    """Unknown export or format, or Parquet without pyarrow."""
+
+def _inventory(session, q, status, tables):
+    qry = select(*[getattr(Item, c) for c in INVENTORY_COLUMNS]).order_by(Item.sku)
+    cond = search_filter(session, q)
+    return qry if cond is None else qry.where(cond)
+
+def _order_lines(session, q, status, tables):
+    o, ln, i = tables["orders"], tables["order_lines"], Item.__table__
+    qry = (select(o.c.ref, o.c.status, o.c.customer, o.c.created_at, i.c.sku, i.c.bin_location,
+                  ln.c.qty, ln.c.allocated_qty, ln.c.picked_qty)
+           .join(o, o.c.id==ln.c.order_id).join(i, i.c.id==ln.c.item_id)
+           .order_by(ln.c.order_id, ln.c.id))
+    return qry.where(o.c.status==status) if status else qry
+
+def _receipt_lines(session, q, status, tables):
+    r, ln, i = tables["receipts"], tables["receipt_lines"], Item.__table__
+    qry = (select(r.c.ref, r.c.status, r.c.vendor, r.c.created_at, i.c.sku, ln.c.qty, ln.c.received_qty)
+           .join(r, r.c.id==ln.c.receipt_id).join(i, i.c.id==ln.c.item_id)
+           .order_by(ln.c.receipt_id, ln.c.id))
+    return qry.where(r.c.status==status) if status else qry
+
+HOT = Base.metadata.tables
+# name -> (columns, fn(session, q, status, tables) -> select, table sets read in order).
+# Order and receipt history is read from the archive first (older), then the hot tables.
+EXPORTS = {
+    "inventory": (INVENTORY_COLUMNS, _inventory, [HOT]),
+    "order_lines": (["order_ref", "status", "customer", "created_at", "sku", "bin_location", "qty", "allocated_qty", "picked_qty"],
+                    _order_lines, [ARCHIVE_TABLES, HOT]),
+    "receipt_lines": (["receipt_ref", "status", "vendor", "created_at", "sku", "qty", "received_qty"],
+                      _receipt_lines, [ARCHIVE_TABLES, HOT]),
+}
+
+def _selects(session, name, q, status, chunksize):
+    _, fn, sources = EXPORTS[name]
+    return [fn(session, q, status, tables).execution_options(yield_per=chunksize) for tables in sources]
+
+def _partitions(session, selects):
+    for qry in selects:
+        yield from session.execute(qry).partitions()
+
+def _csv(session, name, q, status, chunksize):
+    buf = io.StringIO()
+    out = csv.writer(buf)
+    out.writerow(EXPORTS[name][0])
+    for rows in _partitions(session, _selects(session, name, q, status, chunksize)):
+        out.writerows(rows)
+        yield buf.getvalue().encode()
+        buf.seek(0); buf.truncate()
+    if buf.tell():  # header only: nothing matched
+        yield buf.getvalue().encode()
+
+class _Drain(io.RawIOBase):
+    """Write-only sink that hands back whatever was written since the last take()."""
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+    def writable(self):
+        return True
+    def write(self, b):
+        self.parts.append(bytes(b)); self.pos += len(b)
+        return len(b)
+    def tell(self):
+        return self.pos
+    def take(self):
+        data = b"".join(self.parts); self.parts.clear()
+        return data
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export requires pyarrow (pip install pyarrow)")
+    return pa, pq
+
+def _parquet(session, name, q, status, chunksize):
+    pa, pq = _pyarrow()
+    selects = _selects(session, name, q, status, chunksize)
+    types = {"INTEGER": pa.int64(), "SMALLINT": pa.int64(), "DATETIME": pa.timestamp("us")}
+    schema = pa.schema([(n, types.get(str(c.type), pa.string())) for n, c in zip(EXPORTS[name][0], selects[0].selected_columns)])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in _partitions(session, selects):  # one row group per chunk
+        writer.write_table(pa.Table.from_arrays([pa.array(col, type=f.type) for col, f in zip(zip(*rows), schema)], schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+def iter_export(session, name, fmt="csv", q=None, status=None, chunksize=DEFAULT_CHUNKSIZE):
+    """Byte chunks of export `name` in fmt (a key of FORMATS); raises ExportError before any I/O."""
+    if name not in EXPORTS:
+        raise ExportError(f"Unknown export: {name}")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format: {fmt}")
+    if fmt == "parquet":
+        _pyarrow()  # fail before a download starts, not halfway through it
+    return (_csv if fmt == "csv" else _parquet)(session, name, q, status, chunksize)
+
+def file_name(name, fmt):
+    return f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stream a WMS table to CSV or Parquet (see WMS_DB_URL).")
+    ap.add_argument("name", choices=sorted(EXPORTS))
+    ap.add_argument("--format", choices=sorted(FORMATS), default=None, help="default: from --out, else csv")
+    ap.add_argument("--q", help="inventory search text")
+    ap.add_argument("--status", help="order/receipt status")
+    ap.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    ap.add_argument("--out", help="output file (default: stdout)")
+    args = ap.parse_args(argv)
+    fmt = args.format or ("parquet" if (args.out or "").lower().endswith((".parquet", ".pq")) else "csv")
+    from wms.db import SessionLocal
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        with SessionLocal() as s:
+            for chunk in iter_export(s, args.name, fmt, args.q, args.status, args.chunksize):
+                out.write(chunk)
+    except ExportError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        if args.out:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
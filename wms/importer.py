@@ -0,0 +1,242 @@
+"""Streaming bulk import of items, receipts and orders from CSV or Parquet.
+
+    python -m wms.importer items items.csv
+    python -m wms.importer orders orders.parquet --chunksize 10000 --rejects rejects.csv
+
+Expected columns:
+    items     sku, name[, barcode, bin_location, reorder_point, on_hand]
+    receipts  ref, sku, qty[, vendor]      (one row per receipt line)
+    orders    ref, sku, qty[, customer]    (one row per order line)
+
+Files are read chunk by chunk and each chunk is validated and written in its own
+transaction, so memory stays bounded by the chunk size. Items are upserted by SKU
+(on_hand is only set for new SKUs; a blank or missing barcode, bin_location or
+reorder_point leaves the existing value alone). Receipt/order lines are appended to headers
+created by the same import; refs that already existed are rejected. Imported order
+lines are allocated (wms.allocation) in their chunk's transaction.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import defaultdict
+from sqlalchemy import select, func, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from wms.allocation import allocate
+from wms.db import SessionLocal, run_transaction
+from wms.kpi import bump_kpi
+from wms.ledger import record_opening_balances
+from wms.models import Item, Receipt, ReceiptLine, Order, OrderLine
+
+DEFAULT_CHUNKSIZE = 5000
+ITEM_OPTIONAL = ("barcode", "bin_location", "reorder_point")  # updated only when the cell has a value
+KEEP_REJECTS = 100
+KINDS = ("items", "receipts", "orders")
+
+class ImportFileError(ValueError):
+    """The import file itself is unusable (unknown format, missing columns)."""
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.rejects = []  # first KEEP_REJECTS (row_no, reason) pairs
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def add(self, imported, rejects):
+        self.imported += imported
+        self.rejected += len(rejects)
+        self.rejects.extend((n, reason) for n, reason, _ in rejects[:max(0, KEEP_REJECTS - len(self.rejects))])
+
+    def __str__(self):
+        return (f"{self.kind}: {self.rows} rows, {self.imported} imported, {self.rejected} rejected "
+                f"in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/s)")
+
+def iter_chunks(source, chunksize=DEFAULT_CHUNKSIZE, fmt=None):
+    """Yield lists of row dicts (all values as stripped strings) from a CSV or Parquet path/file object."""
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    fmt = fmt or ("parquet" if str(name).lower().endswith((".parquet", ".pq")) else "csv")
+    if fmt == "csv":
+        import pandas as pd
+        for df in pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False):
+            yield [{k: str(v).strip() for k, v in row.items()} for row in df.to_dict("records")]
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportFileError("Parquet import requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            cols = batch.to_pydict()
+            keys = list(cols)
+            yield [{k: ("" if v is None else str(v).strip()) for k, v in zip(keys, vals)} for vals in zip(*cols.values())]
+    else:
+        raise ImportFileError(f"Unknown format: {fmt}")
+
+def _int(v, default=None):
+    if v in ("", None):
+        if default is None:
+            raise ValueError("missing")
+        return default
+    f = float(v)
+    if f != int(f):
+        raise ValueError(f"not an integer: {v}")
+    return int(f)
+
+def _require(rows, cols):
+    missing = [c for c in cols if rows and c not in rows[0]]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+
+# ---------- Chunk writers (each runs inside one transaction) ----------
+def _import_items(session, rows, start, rejects):
+    _require(rows, ["sku", "name"])
+    good = {}
+    barcodes = {}
+    for n, r in enumerate(rows, start):
+        try:
+            rec = {"sku": r["sku"], "name": r["name"], "on_hand": _int(r.get("on_hand"), 0)}
+            rec.update({c: r[c] for c in ITEM_OPTIONAL if r.get(c)})
+            if "reorder_point" in rec:
+                rec["reorder_point"] = _int(rec["reorder_point"])
+        except ValueError as e:
+            rejects.append((n, f"bad number ({e})", r)); continue
+        if not rec["sku"] or not rec["name"]:
+            rejects.append((n, "sku and name are required", r)); continue
+        if rec["sku"] in good:
+            rejects.append((n, f"duplicate sku {rec['sku']} in file chunk", r)); continue
+        if rec.get("barcode") and barcodes.get(rec["barcode"], rec["sku"]) != rec["sku"]:
+            rejects.append((n, f"duplicate barcode {rec['barcode']} in file chunk", r)); continue
+        if rec["on_hand"] < 0:
+            rejects.append((n, "on_hand cannot be negative", r)); continue
+        good[rec["sku"]] = (n, rec)
+        if rec.get("barcode"):
+            barcodes[rec["barcode"]] = rec["sku"]
+    if not good:
+        return 0
+    existing = set(session.scalars(select(Item.sku).where(Item.sku.in_(good))))
+    taken = dict(session.execute(select(Item.barcode, Item.sku).where(Item.barcode.in_(barcodes))).all()) if barcodes else {}
+    recs = []
+    for sku, (n, rec) in good.items():
+        owner = taken.get(rec.get("barcode"))
+        if owner and owner != sku:
+            rejects.append((n, f"barcode {rec['barcode']} already used by {owner}", rec)); continue
+        recs.append(rec)
+    if not recs:
+        return 0
+    # One upsert per set of optional columns present, so blank cells neither overwrite
+    # existing values nor replace column defaults on new items.
+    groups = defaultdict(list)
+    for rec in recs:
+        groups[tuple(c for c in ITEM_OPTIONAL if c in rec)].append(rec)
+    for cols, group in groups.items():
+        stmt = sqlite_insert(Item)
+        stmt = stmt.on_conflict_do_update(index_elements=[Item.sku],
+                                          set_={"name": stmt.excluded.name, **{c: stmt.excluded[c] for c in cols}})
+        session.execute(stmt, group)
+    new_skus = [r["sku"] for r in recs if r["sku"] not in existing]
+    bump_kpi(session, "on_hand", sum(r["on_hand"] for r in recs if r["sku"] not in existing))
+    if new_skus:
+        record_opening_balances(session, session.scalars(select(Item.id).where(Item.sku.in_(new_skus))).all())
+    return len(recs)
+
+def _import_lines(session, rows, start, rejects, header, line_cls, fk, party, watermark):
+    _require(rows, ["ref", "sku", "qty"])
+    skus = {r["sku"] for r in rows}
+    item_ids = dict(session.execute(select(Item.sku, Item.id).where(Item.sku.in_(skus))).all())
+    refs = {r["ref"] for r in rows if r["ref"]}
+    headers = dict(session.execute(select(header.ref, header.id).where(header.ref.in_(refs))).all())
+    new_headers = {}
+    good = []
+    for n, r in enumerate(rows, start):
+        ref = r["ref"]
+        if not ref:
+            rejects.append((n, "ref is required", r)); continue
+        if ref in headers and headers[ref] <= watermark:
+            rejects.append((n, f"ref {ref} already exists", r)); continue
+        if r["sku"] not in item_ids:
+            rejects.append((n, f"unknown sku {r['sku']}", r)); continue
+        try:
+            qty = _int(r["qty"])
+        except ValueError as e:
+            rejects.append((n, f"bad qty ({e})", r)); continue
+        if qty <= 0:
+            rejects.append((n, "qty must be positive", r)); continue
+        if ref not in headers:
+            new_headers.setdefault(ref, r.get(party) or None)
+        good.append((ref, item_ids[r["sku"]], qty))
+    if new_headers:
+        session.execute(insert(header), [{"ref": ref, party: p} for ref, p in new_headers.items()])
+        headers.update(session.execute(select(header.ref, header.id).where(header.ref.in_(new_headers))).all())
+        if header is Order:
+            bump_kpi(session, "orders:open", len(new_headers))
+    if good:
+        session.execute(insert(line_cls), [{fk: headers[ref], "item_id": iid, "qty": qty} for ref, iid, qty in good])
+        if header is Order:
+            allocate(session, {iid for _, iid, _ in good})  # reserve stock for the new lines, FIFO with older ones
+    return len(good)
+
+def _run_chunk(session, writer_fn, rows, start, *args):
+    rejects = []  # fresh per attempt, so a retried transaction does not double count
+    return writer_fn(session, rows, start, rejects, *args), rejects
+
+def import_file(kind, source, chunksize=DEFAULT_CHUNKSIZE, fmt=None, rejects_path=None, session_factory=None):
+    """Import one file; returns an ImportReport. Rejected rows are optionally written to rejects_path."""
+    if kind not in KINDS:
+        raise ImportFileError(f"Unknown import kind: {kind}")
+    factory = session_factory or SessionLocal
+    if kind == "items":
+        args = (_import_items,)
+    else:
+        header, line_cls, fk, party = ((Receipt, ReceiptLine, "receipt_id", "vendor") if kind == "receipts"
+                                       else (Order, OrderLine, "order_id", "customer"))
+        with factory() as s:
+            watermark = s.scalar(select(func.coalesce(func.max(header.id), 0)))
+        args = (_import_lines, header, line_cls, fk, party, watermark)
+    report = ImportReport(kind)
+    fh = writer = None
+    t0 = time.perf_counter()
+    try:
+        for rows in iter_chunks(source, chunksize, fmt):
+            start = report.rows + 2  # file line number: 1-based, after the header line
+            imported, rejects = run_transaction(_run_chunk, args[0], rows, start, *args[1:], session_factory=factory)
+            report.rows += len(rows)
+            report.add(imported, rejects)
+            if rejects_path and rejects:
+                if writer is None:
+                    fh = open(rejects_path, "w", newline="")
+                    writer = csv.writer(fh); writer.writerow(["row", "reason", "data"])
+                writer.writerows([n, reason, "|".join(f"{k}={v}" for k, v in row.items())] for n, reason, row in rejects)
+    finally:
+        report.seconds = time.perf_counter() - t0
+        if fh:
+            fh.close()
+    return report
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk import items, receipts or orders from CSV/Parquet.")
+    ap.add_argument("kind", choices=KINDS)
+    ap.add_argument("path")
+    ap.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    ap.add_argument("--format", choices=["csv", "parquet"], default=None)
+    ap.add_argument("--rejects", help="write rejected rows (row number, reason) to this CSV")
+    args = ap.parse_args(argv)
+    if not os.path.exists(args.path):
+        ap.error(f"no such file: {args.path}")
+    from wms.bootstrap import ensure_db
+    ensure_db()
+    report = import_file(args.kind, args.path, args.chunksize, args.format, args.rejects)
+    print(report)
+    for n, reason in report.rejects[:20]:
+        print(f"  row {n}: {reason}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+from sqlalchemy import select, func, case, literal, union_all, text
+
+from wms.models import ARCHIVE_TABLES, Item, Order, KpiCounter, ORDER_STATUSES
+
+def _order_stats(orders, prefix):
+    fulfill_secs = (func.julianday(orders.c.shipped_at) - func.julianday(orders.c.created_at)) * 86400.0
+    return (select(literal(prefix) + orders.c.status, func.count(orders.c.id),
+                   func.coalesce(func.sum(case((orders.c.shipped_at.is_not(None), 1), else_=0)),0),
+                   func.coalesce(func.sum(fulfill_secs),0.0)).group_by(orders.c.status))
+
+def compute_dashboard_metrics(session):
+    """All dashboard KPIs from one grouped SQL pass (on-hand total + per-status order stats).
+
+    orders:<status> count hot orders only (what the Orders page lists); archived orders
+    count as archived:orders:<status>. Fulfillment totals cover both.
+    """
+    stmt = union_all(
+        select(literal("on_hand"), func.coalesce(func.sum(Item.on_hand),0), literal(0), literal(0.0)),
+        _order_stats(Order.__table__, "orders:"),
+        _order_stats(ARCHIVE_TABLES["orders"], "archived:orders:"),
+    )
+    m = {"on_hand": 0, "fulfilled": 0, "fulfill_seconds": 0}
+    m.update({f"{prefix}{stt}": 0 for stt in ORDER_STATUSES for prefix in ("orders:", "archived:orders:")})
+    for key, n, fulfilled, secs in session.execute(stmt):
+        if key == "on_hand":
+            m["on_hand"] = int(n)
+        else:
+            m[key] = int(n)
+            m["fulfilled"] += int(fulfilled)
+            m["fulfill_seconds"] += int(round(secs))
+    return m
+
+def rebuild_kpi_counters(session):
+    """Recompute kpi_counters from the base tables (startup, or after bulk changes)."""
+    m = compute_dashboard_metrics(session)
+    session.query(KpiCounter).filter(KpiCounter.name.in_(m)).delete()
+    session.add_all([KpiCounter(name=k, value=v) for k, v in m.items()])
+    session.commit()
+    return m
+
+# text() rather than the dialect insert().on_conflict_do_update(): that construct is not
+# statement-cached and recompiled on every call, which dominated single-pick transactions.
+_BUMP = text("INSERT INTO kpi_counters (name, value) VALUES (:name, :delta) "
+             "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value")
+
+def bump_kpi(session, name, delta):
+    """Atomically add delta to a counter; runs inside the caller's transaction."""
+    if not delta:
+        return
+    session.execute(_BUMP, {"name": name, "delta": delta})
+
+def set_order_status(session, order, status):
+    """Change order status and keep the per-status counters in step."""
+    if order.status != status:
+        bump_kpi(session, f"orders:{order.status}", -1)
+        bump_kpi(session, f"orders:{status}", 1)
+        order.status = status
+
+def load_kpis(session):
+    m = dict(session.execute(select(KpiCounter.name, KpiCounter.value)).all())
+    return m if "on_hand" in m else rebuild_kpi_counters(session)
@@ -0,0 +1,154 @@
+"""Inventory movement ledger, point-in-time stock and reconciliation.
+
+Every stock change appends an integer-coded row to inventory_movements in the same
+transaction that updates Item.on_hand, so on_hand is a cache of the ledger sum.
+Periodic snapshots store per-item balances; stock at time T is the latest snapshot
+at or before T plus the movements after it.
+
+    python -m wms.ledger snapshot
+    python -m wms.ledger reconcile [--fix]
+    python -m wms.ledger at "2026-10-17 06:00" [--sku SKU-001]
+"""
+import argparse
+import calendar
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import select, func, insert, text, bindparam
+
+from wms.models import Item, InventoryMovement
+
+OPENING, RECEIVE, PICK, ADJUST, REVERSAL = 0, 1, 2, 3, 4
+KIND_NAMES = {OPENING: "opening", RECEIVE: "receive", PICK: "pick", ADJUST: "adjust", REVERSAL: "reversal"}
+
+def to_ts(dt=None):
+    """Unix seconds for a naive UTC datetime (now when omitted)."""
+    return int(time.time()) if dt is None else calendar.timegm(dt.timetuple())
+
+def record(session, rows, ts=None):
+    """Append movements [(item_id, kind, qty, ref_id)] in the caller's transaction."""
+    ts = to_ts() if ts is None else ts
+    rows = [{"item_id": iid, "kind": kind, "qty": qty, "ts": ts, "ref_id": ref} for iid, kind, qty, ref in rows if qty]
+    if rows:
+        session.execute(insert(InventoryMovement), rows)
+
+def record_opening_balances(session, item_ids=None):
+    """Opening movements for items that have stock but no ledger history yet (caller commits)."""
+    qry = ("INSERT INTO inventory_movements (item_id, kind, qty, ts, ref_id) "
+           "SELECT i.id, :kind, i.on_hand, :ts, NULL FROM items i "
+           "WHERE i.on_hand != 0 AND NOT EXISTS (SELECT 1 FROM inventory_movements m WHERE m.item_id = i.id)")
+    params = {"kind": OPENING, "ts": to_ts()}
+    if item_ids is None:
+        session.execute(text(qry), params)
+    elif item_ids:
+        stmt = text(qry + " AND i.id IN :ids").bindparams(bindparam("ids", expanding=True))
+        session.execute(stmt, {**params, "ids": list(item_ids)})
+
+_STOCK_AT = """
+WITH snap AS (
+    SELECT item_id, on_hand, last_movement_id FROM (
+        SELECT item_id, on_hand, last_movement_id,
+               ROW_NUMBER() OVER (PARTITION BY item_id ORDER BY ts DESC) AS rn
+        FROM inventory_snapshots WHERE ts <= :ts {snap_filter}
+    ) WHERE rn = 1
+)
+SELECT i.id, i.sku,
+       COALESCE(snap.on_hand, 0) + COALESCE(SUM(m.qty), 0) AS on_hand,
+       COUNT(m.id) AS tail
+FROM items i
+LEFT JOIN snap ON snap.item_id = i.id
+LEFT JOIN inventory_movements m
+       ON m.item_id = i.id AND m.id > COALESCE(snap.last_movement_id, 0) AND m.ts <= :ts AND m.id <= :max_id
+{item_filter}
+GROUP BY i.id
+"""
+
+def _stock_at(session, ts, item_ids=None, max_id=None):
+    params = {"ts": ts, "max_id": max_id if max_id is not None else sys.maxsize}
+    if item_ids is None:
+        stmt = text(_STOCK_AT.format(snap_filter="", item_filter=""))
+    else:
+        stmt = text(_STOCK_AT.format(snap_filter="AND item_id IN :ids", item_filter="WHERE i.id IN :ids"))
+        stmt = stmt.bindparams(bindparam("ids", expanding=True))
+        params["ids"] = list(item_ids)
+    return session.execute(stmt, params).all()
+
+def stock_at(session, when, item_ids=None):
+    """{item_id: on_hand} as of a naive UTC datetime (or unix seconds)."""
+    ts = when if isinstance(when, int) else to_ts(when)
+    return {iid: on_hand for iid, _, on_hand, _ in _stock_at(session, ts, item_ids)}
+
+def take_snapshot(session):
+    """Snapshot current balances of items that moved since their last snapshot (caller commits); returns rows written.
+
+    Always "now": a snapshot's balance sums every movement up to its last_movement_id, whatever
+    their ts, so later stock_at() calls, which skip those ids, never lose one.
+    """
+    ts = to_ts()
+    max_id = session.scalar(select(func.coalesce(func.max(InventoryMovement.id), 0)))
+    rows = [{"item_id": iid, "ts": ts, "on_hand": on_hand, "last_movement_id": max_id}
+            for iid, _, on_hand, tail in _stock_at(session, sys.maxsize, max_id=max_id) if tail]
+    if rows:
+        session.execute(text("INSERT OR REPLACE INTO inventory_snapshots (item_id, ts, on_hand, last_movement_id) "
+                             "VALUES (:item_id, :ts, :on_hand, :last_movement_id)"), rows)
+    return len(rows)
+
+def reconcile(session, fix=False):
+    """Items whose on_hand differs from the ledger total, from one aggregate pass.
+
+    Returns [(item_id, sku, on_hand, ledger_total)]; with fix=True the cache is reset
+    to the ledger total (caller commits and rebuilds KPI counters).
+    """
+    ledger = (select(InventoryMovement.item_id, func.sum(InventoryMovement.qty).label("total"))
+              .group_by(InventoryMovement.item_id).subquery())
+    total = func.coalesce(ledger.c.total, 0)
+    rows = session.execute(select(Item.id, Item.sku, Item.on_hand, total)
+                           .outerjoin(ledger, ledger.c.item_id==Item.id)
+                           .where(func.coalesce(Item.on_hand, 0) != total)).all()
+    if fix and rows:
+        it = Item.__table__
+        session.execute(it.update().where(it.c.id==bindparam("b_id")).values(on_hand=bindparam("b_total")),
+                        [{"b_id": iid, "b_total": t} for iid, _, _, t in rows])
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Inventory ledger maintenance.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("snapshot", help="snapshot balances of items that moved")
+    rc = sub.add_parser("reconcile", help="compare Item.on_hand with the ledger")
+    rc.add_argument("--fix", action="store_true", help="reset on_hand to the ledger total")
+    at = sub.add_parser("at", help="stock at a UTC time, e.g. '2026-10-17 06:00'")
+    at.add_argument("when")
+    at.add_argument("--sku")
+    args = ap.parse_args(argv)
+
+    from wms.bootstrap import ensure_db
+    from wms.db import SessionLocal
+    from wms.kpi import rebuild_kpi_counters
+    ensure_db()
+    with SessionLocal() as s:
+        if args.cmd == "snapshot":
+            n = take_snapshot(s); s.commit()
+            print(f"snapshot: {n} items")
+        elif args.cmd == "reconcile":
+            rows = reconcile(s, fix=args.fix)
+            for iid, sku, on_hand, total in rows[:50]:
+                print(f"{sku}: on_hand {on_hand} != ledger {total}")
+            print(f"{len(rows)} mismatched items" + (" (fixed)" if args.fix and rows else ""))
+            if args.fix and rows:
+                s.commit(); rebuild_kpi_counters(s)
+            return 1 if rows and not args.fix else 0
+        else:
+            ids = None
+            if args.sku:
+                iid = s.scalar(select(Item.id).where(Item.sku==args.sku))
+                if iid is None:
+                    ap.error(f"unknown sku {args.sku}")
+                ids = [iid]
+            when = datetime.fromisoformat(args.when)
+            for iid, sku, on_hand, _ in _stock_at(s, to_ts(when), ids):
+                print(f"{sku}\t{on_hand}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Load generator for the scanner API: many simulated handhelds on keep-alive connections.
+
+Each client loops scan -> lookup, and every --pick-every-th scan picks one unit
+from an open order line, pausing --think-ms (randomized +-50%) between scans like an
+operator walking to the next bin; --think-ms 0 gives a closed-loop stress test.
+Barcodes and line ids come from the same database as the API (WMS_DB_URL). Reports
+latency percentiles and throughput per endpoint and exits non-zero when the overall
+p99 exceeds --target-ms. Run it on a different machine (or core) than the API for
+numbers that are not inflated by the generator's own threads.
+
+    python -m wms.api &                       # or: python -m wms.loadgen --spawn
+    python -m wms.loadgen --clients 200 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+from sqlalchemy import select
+
+from wms.bench import percentile
+
+def _targets(limit=5000):
+    from wms.db import SessionLocal
+    from wms.models import Item, Order, OrderLine
+    with SessionLocal() as s:
+        barcodes = s.scalars(select(Item.barcode).where(Item.barcode.is_not(None)).limit(limit)).all()
+        lines = s.scalars(select(OrderLine.id).join(Order, Order.id==OrderLine.order_id)
+                          .where(Order.status.in_(["open", "picking"]), OrderLine.picked_qty < OrderLine.qty).limit(limit)).all()
+    return barcodes, lines
+
+def _client(url, token, barcodes, lines, pick_every, think, deadline, seed, out):
+    u = urlsplit(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    rnd = random.Random(seed)
+    lat, statuses = defaultdict(list), Counter()
+    n = 0
+    time.sleep(think * rnd.random())  # stagger handhelds instead of a synchronized first burst
+    while time.perf_counter() < deadline:
+        n += 1
+        if lines and pick_every and n % pick_every == 0:
+            kind, method, path, body = "pick", "POST", f"/order-lines/{rnd.choice(lines)}/pick", b'{"qty": 1}'
+        else:
+            kind, method, path, body = "scan", "GET", f"/items/{rnd.choice(barcodes)}", None
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse(); resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            conn.close(); conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+            status = "conn-error"
+        lat[kind].append(time.perf_counter() - t0)
+        statuses[(kind, status)] += 1
+        if think:
+            time.sleep(think * rnd.uniform(0.5, 1.5))
+    conn.close()
+    out.append((lat, statuses))
+
+def run(url, clients=100, seconds=10.0, pick_every=10, think_ms=500.0, token=None, seed=42):
+    sys.setswitchinterval(0.0005)  # see wms.api.SWITCH_INTERVAL; keeps client-side timing honest
+    barcodes, lines = _targets()
+    if not barcodes:
+        raise SystemExit("no items with barcodes; generate data first (python -m wms.datagen)")
+    deadline = time.perf_counter() + seconds
+    out = []
+    threads = [threading.Thread(target=_client, args=(url, token, barcodes, lines, pick_every, think_ms / 1000.0, deadline, seed + i, out), daemon=True)
+               for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat, statuses = defaultdict(list), Counter()
+    for l, s in out:
+        for k, v in l.items():
+            lat[k].extend(v)
+        statuses.update(s)
+    report = {"clients": clients, "seconds": round(elapsed, 2), "statuses": {f"{k}:{s}": n for (k, s), n in sorted(statuses.items(), key=str)}}
+    for kind, vals in list(lat.items()) + [("all", [v for vs in lat.values() for v in vs])]:
+        ms = [v * 1000.0 for v in vals]
+        report[kind] = {"requests": len(ms), "rps": round(len(ms) / elapsed, 1), "p50_ms": round(percentile(ms, 50), 2),
+                        "p95_ms": round(percentile(ms, 95), 2), "p99_ms": round(percentile(ms, 99), 2), "max_ms": round(max(ms), 2)}
+    return report
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load-test the scanner API.")
+    ap.add_argument("--url", default="http://127.0.0.1:8502")
+    ap.add_argument("--clients", type=int, default=100)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--pick-every", type=int, default=10, help="every Nth request is a pick (0 = scans only)")
+    ap.add_argument("--think-ms", type=float, default=500.0, help="mean pause between a client's requests")
+    ap.add_argument("--target-ms", type=float, default=10.0, help="fail when overall p99 exceeds this")
+    ap.add_argument("--spawn", action="store_true", help="start python -m wms.api for the run")
+    args = ap.parse_args(argv)
+    proc = None
+    if args.spawn:
+        port = urlsplit(args.url).port or 8502
+        proc = subprocess.Popen([sys.executable, "-m", "wms.api", "--port", str(port), "--pool", str(min(64, args.clients))],
+                                stdout=subprocess.PIPE, text=True)
+        proc.stdout.readline()  # wait for the "listening" line
+    try:
+        report = run(args.url, args.clients, args.seconds, args.pick_every, args.think_ms, token=os.environ.get("WMS_API_TOKEN"))
+    finally:
+        if proc:
+            proc.terminate(); proc.wait()
+    print(json.dumps(report, indent=2))
+    return 1 if report["all"]["p99_ms"] > args.target_ms else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
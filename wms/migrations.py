@@ -0,0 +1,170 @@
+"""Versioned schema migrations.
+
+schema_version records each applied step. migrate() reads the highest applied
+version and runs only the steps after it, so starting against an up-to-date
+database costs one SELECT instead of create_all() and table inspection.
+
+To change the schema, append a step to MIGRATIONS; never edit one that has shipped.
+Steps must be idempotent (IF NOT EXISTS, checkfirst): SQLite DDL from a step that
+failed halfway may already be applied, and two processes may start at once.
+
+    python -m wms.migrations            # migrate and print the version
+    python -m wms.migrations --status   # show applied/pending steps only
+"""
+import argparse
+import sys
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from wms.allocation import allocate, rebuild_reservations
+from wms.archive import ensure_archive
+from wms.db import Base, SessionLocal, engine
+from wms.catalog import ensure_catalog_triggers
+from wms.models import ARCHIVE_TABLES, AppSetting, AuthSession, StockEvent, archive_metadata
+from wms.replenish import ensure_low_stock_triggers
+from wms.search import ensure_search_index
+
+SCHEMA_VERSION_DDL = ("CREATE TABLE IF NOT EXISTS schema_version ("
+                      "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TEXT NOT NULL)")
+
+def add_missing_columns(bind):
+    """Add model columns missing from tables of an older database (SQLite ADD COLUMN)."""
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in have:
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(bind.dialect)}"
+                    if col.server_default is not None:
+                        ddl += f" NOT NULL DEFAULT {col.server_default.arg}" if not col.nullable else f" DEFAULT {col.server_default.arg}"
+                    conn.execute(text(ddl))
+
+def _baseline(bind):
+    # Databases created before versioning may have any subset of this; every part is idempotent.
+    Base.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+    ensure_search_index(bind)
+    ensure_catalog_triggers(bind)
+
+def _app_settings(bind):
+    AppSetting.__table__.create(bind=bind, checkfirst=True)
+
+def _create_indexes(bind, names, metadata=Base.metadata):
+    # IF NOT EXISTS rather than checkfirst: SQLite reflection skips expression indexes.
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            for ix in table.indexes:
+                if ix.name in names:
+                    conn.execute(CreateIndex(ix, if_not_exists=True))
+
+def _keyset_indexes(bind):
+    _create_indexes(bind, {"ix_items_name_id", "ix_items_bin_id", "ix_receipts_created_id",
+                           "ix_orders_created_id", "ix_orders_status_created_id"})
+
+def _replenishment(bind):
+    StockEvent.__table__.create(bind=bind, checkfirst=True)
+    _create_indexes(bind, {"ix_items_low_stock"})
+    ensure_low_stock_triggers(bind)
+
+def _foreign_key_indexes(bind):
+    _create_indexes(bind, {"ix_order_lines_order_item", "ix_order_lines_item", "ix_receipt_lines_receipt_item",
+                           "ix_receipt_lines_item", "ix_shipments_order", "ix_receipts_status_created_id"})
+    _create_indexes(bind, {"ix_archive_orders_status", "ix_archive_receipts_status"}, archive_metadata)
+
+def _autoincrement_ids(bind):
+    # Rebuild the archived tables as AUTOINCREMENT (SQLite cannot ALTER that in) and start each
+    # sequence above every id in either tier. One script per table, inside BEGIN IMMEDIATE, so a
+    # crash leaves the old table; foreign keys are not enforced (wms.db), so DROP leaves children alone.
+    with bind.connect() as conn:
+        raw = conn.connection.driver_connection
+        for name in ARCHIVE_TABLES:
+            table = Base.metadata.tables[name]
+            script = ["BEGIN IMMEDIATE;"]
+            ddl = raw.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()[0]
+            if "AUTOINCREMENT" not in ddl.upper():
+                cols = ", ".join(c.name for c in table.columns)
+                create = str(CreateTable(table).compile(dialect=bind.dialect)).strip()
+                script += [create.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {name}__new ", 1) + ";",
+                           f"INSERT INTO {name}__new ({cols}) SELECT {cols} FROM {name};",
+                           f"DROP TABLE {name};",
+                           f"ALTER TABLE {name}__new RENAME TO {name};"]
+                script += [f"{CreateIndex(ix).compile(dialect=bind.dialect)};" for ix in table.indexes]
+            script += [f"INSERT INTO main.sqlite_sequence (name, seq) SELECT '{name}', 0 "
+                       f"WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name='{name}');",
+                       f"UPDATE main.sqlite_sequence SET seq = max(seq, (SELECT coalesce(max(id), 0) FROM main.{name}), "
+                       f"(SELECT coalesce(max(id), 0) FROM {archive_metadata.schema}.{name})) WHERE name='{name}';",
+                       "COMMIT;"]
+            raw.executescript("\n".join(script))
+
+def _reserve_open_lines(bind):
+    # Open lines from before allocation existed got allocated_qty 0 from ADD COLUMN; reserve for
+    # them once, oldest first, so newer orders cannot take their stock. Idempotent.
+    with SessionLocal(bind=bind) as s:
+        rebuild_reservations(s)
+        allocate(s)
+        s.commit()
+
+def _auth_sessions(bind):
+    AuthSession.__table__.create(bind=bind, checkfirst=True)
+
+# (version, description, fn(engine))
+MIGRATIONS = [
+    (1, "baseline: tables, added columns, FTS search index, catalog triggers", _baseline),
+    (2, "app_settings (session token signing key)", _app_settings),
+    (3, "indexes for keyset pagination of items, receipts and orders", _keyset_indexes),
+    (4, "archive database tables for finished orders and receipts", ensure_archive),
+    (5, "stock_events queue, low-stock trigger and partial index", _replenishment),
+    (6, "indexes on order/receipt line and shipment foreign keys, receipts and archive by status", _foreign_key_indexes),
+    (7, "users.token_gen (session token revocation on sign-out)", add_missing_columns),
+    (8, "AUTOINCREMENT ids for archived tables, sequences above archived ids", _autoincrement_ids),
+    (9, "auth_sessions (server-side sessions, single-use URL handles)", _auth_sessions),
+    (10, "reserve stock for open order lines that predate allocation", _reserve_open_lines),
+]
+LATEST = MIGRATIONS[-1][0]
+
+def current_version(bind):
+    """Highest applied version; 0 for a new database or one created before versioning."""
+    try:
+        with bind.connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+    except OperationalError:  # no schema_version table yet
+        return 0
+
+def migrate(bind=None):
+    """Apply pending migrations in order; returns the versions applied (empty when current)."""
+    bind = bind if bind is not None else engine
+    version = current_version(bind)
+    if version >= LATEST:
+        return []
+    with bind.begin() as conn:
+        conn.execute(text(SCHEMA_VERSION_DDL))
+    applied = []
+    for v, desc, fn in MIGRATIONS:
+        if v <= version:
+            continue
+        fn(bind)
+        with bind.begin() as conn:
+            conn.execute(text("INSERT OR IGNORE INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                         {"v": v, "d": desc, "t": datetime.utcnow().isoformat(timespec="seconds")})
+        applied.append(v)
+    return applied
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply WMS schema migrations (see WMS_DB_URL).")
+    ap.add_argument("--status", action="store_true", help="list applied and pending steps without migrating")
+    args = ap.parse_args(argv)
+    if not args.status:
+        applied = migrate()
+        print(f"applied {applied}" if applied else "schema is current")
+    version = current_version(engine)
+    for v, desc, _ in MIGRATIONS:
+        print(f"{v:>4} {'applied' if v <= version else 'pending':8} {desc}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
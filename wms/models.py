@@ -0,0 +1,178 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, ForeignKey, Index, MetaData, Table, func, literal_column
+from sqlalchemy.orm import relationship
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from wms.db import ARCHIVE_SCHEMA, Base
+
+class User(Base):
+    __tablename__ = "users"
+    id = Column(Integer, primary_key=True)
+    username = Column(String(80), unique=True, nullable=False)
+    password_hash = Column(String(255), nullable=False)
+    role = Column(String(32), nullable=False, default="picker")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    token_gen = Column(Integer, default=0, server_default="0", nullable=False)  # bumped to end all sessions (wms.auth)
+
+    def set_password(self, pw): self.password_hash = generate_password_hash(pw)
+    def check_password(self, pw): return check_password_hash(self.password_hash, pw)
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    sku = Column(String(64), unique=True, nullable=False)
+    name = Column(String(200), nullable=False)
+    barcode = Column(String(128), unique=True, nullable=True)
+    bin_location = Column(String(64), nullable=True)
+    reorder_point = Column(Integer, default=0)
+    on_hand = Column(Integer, default=0)
+    reserved = Column(Integer, default=0, server_default="0", nullable=False)  # allocated to open order lines
+    # keyset pagination by name / bin (wms.search.INVENTORY_SORTS); sku has its unique index.
+    # ix_items_low_stock is partial: only items at or below their reorder point (dashboard alerts).
+    __table_args__ = (Index("ix_items_name_id", "name", "id"),
+                      Index("ix_items_bin_id", func.coalesce(bin_location, literal_column("''")), id),
+                      Index("ix_items_low_stock", "sku", sqlite_where=on_hand <= reorder_point))
+
+    @property
+    def available(self): return (self.on_hand or 0) - (self.reserved or 0)
+
+# Tables whose rows move to the archive (wms.archive): AUTOINCREMENT so SQLite never hands an
+# archived row's id to a new row (plain INTEGER PRIMARY KEY reuses max(id) + 1).
+NEVER_REUSE_IDS = {"sqlite_autoincrement": True}
+
+class Receipt(Base):
+    __tablename__ = "receipts"
+    id = Column(Integer, primary_key=True)
+    ref = Column(String(64), unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    vendor = Column(String(128), nullable=True)
+    status = Column(String(16), default="open")  # draft (suggested replenishment), open, received
+    lines = relationship("ReceiptLine", back_populates="receipt", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_receipts_created_id", "created_at", "id"),
+                      Index("ix_receipts_status_created_id", "status", "created_at", "id"), NEVER_REUSE_IDS)
+
+class ReceiptLine(Base):
+    __tablename__ = "receipt_lines"
+    id = Column(Integer, primary_key=True)
+    receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=False)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    qty = Column(Integer, nullable=False)
+    received_qty = Column(Integer, default=0)
+    item = relationship("Item")
+    receipt = relationship("Receipt", back_populates="lines")
+    # lines of a receipt (loads, archive moves); inbound qty per item (wms.replenish)
+    __table_args__ = (Index("ix_receipt_lines_receipt_item", "receipt_id", "item_id"),
+                      Index("ix_receipt_lines_item", "item_id"), NEVER_REUSE_IDS)
+
+class Order(Base):
+    __tablename__ = "orders"
+    id = Column(Integer, primary_key=True)
+    ref = Column(String(64), unique=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    customer = Column(String(128), nullable=True)
+    status = Column(String(16), default="open")  # open, picking, packed, shipped, closed
+    picked_at = Column(DateTime, nullable=True)
+    shipped_at = Column(DateTime, nullable=True)
+    lines = relationship("OrderLine", back_populates="order", cascade="all, delete-orphan")
+    shipments = relationship("Shipment", back_populates="order", cascade="all, delete-orphan")
+    # newest-first keyset pages, all orders or one status (wms.queries.load_orders_page)
+    __table_args__ = (Index("ix_orders_created_id", "created_at", "id"),
+                      Index("ix_orders_status_created_id", "status", "created_at", "id"), NEVER_REUSE_IDS)
+
+class OrderLine(Base):
+    __tablename__ = "order_lines"
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    qty = Column(Integer, nullable=False)
+    picked_qty = Column(Integer, default=0)
+    allocated_qty = Column(Integer, default=0, server_default="0", nullable=False)  # reserved, not yet picked
+    item = relationship("Item")
+    order = relationship("Order", back_populates="lines")
+    # lines of an order (loads, pick lists, release, archive moves); open lines per item (wms.allocation)
+    __table_args__ = (Index("ix_order_lines_order_item", "order_id", "item_id"),
+                      Index("ix_order_lines_item", "item_id"), NEVER_REUSE_IDS)
+
+class Shipment(Base):
+    __tablename__ = "shipments"
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    carrier = Column(String(64), nullable=True)
+    tracking_no = Column(String(128), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    order = relationship("Order", back_populates="shipments")
+    __table_args__ = (Index("ix_shipments_order", "order_id"), NEVER_REUSE_IDS)
+
+class Wave(Base):
+    __tablename__ = "waves"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    status = Column(String(16), default="released")  # released, picked
+    orders = relationship("WaveOrder", back_populates="wave", cascade="all, delete-orphan", order_by="WaveOrder.slot")
+
+class WaveOrder(Base):
+    __tablename__ = "wave_orders"
+    wave_id = Column(Integer, ForeignKey("waves.id"), primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), primary_key=True, unique=True)
+    slot = Column(Integer, nullable=False)  # put-wall cubby
+    wave = relationship("Wave", back_populates="orders")
+
+class InventoryMovement(Base):
+    """Append-only stock ledger; Item.on_hand is the running sum of qty per item."""
+    __tablename__ = "inventory_movements"
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
+    kind = Column(SmallInteger, nullable=False)  # wms.ledger.OPENING/RECEIVE/PICK/ADJUST/REVERSAL
+    qty = Column(Integer, nullable=False)        # signed delta
+    ts = Column(Integer, nullable=False)         # unix seconds, UTC
+    ref_id = Column(Integer, nullable=True)      # receipt/order line, or reversed movement id
+    __table_args__ = (Index("ix_inventory_movements_item_ts", "item_id", "ts"),)
+
+class InventorySnapshot(Base):
+    __tablename__ = "inventory_snapshots"
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    ts = Column(Integer, primary_key=True)
+    on_hand = Column(Integer, nullable=False)
+    last_movement_id = Column(Integer, nullable=False)  # movements with id <= this are included
+
+class KpiCounter(Base):
+    __tablename__ = "kpi_counters"
+    name = Column(String(64), primary_key=True)  # on_hand, orders:<status>, archived:orders:<status>, fulfilled, fulfill_seconds
+    value = Column(Integer, nullable=False, default=0)
+
+class StockEvent(Base):
+    """Items that went (or stayed) below their reorder point; filled by a trigger, drained by wms.replenish."""
+    __tablename__ = "stock_events"
+    item_id = Column(Integer, primary_key=True)
+    ts = Column(Integer, nullable=False)  # unix seconds of the first unprocessed change
+
+class AppSetting(Base):
+    __tablename__ = "app_settings"
+    name = Column(String(64), primary_key=True)  # secret_key (signed tokens before auth_sessions)
+    value = Column(String(255), nullable=False)
+
+class AuthSession(Base):
+    """Signed-in sessions (wms.auth); the URL carries only the single-use handle, never the id."""
+    __tablename__ = "auth_sessions"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_gen = Column(Integer, nullable=False)  # users.token_gen at sign-in
+    handle = Column(String(64), unique=True, nullable=False)  # sha256 of the current ?session= handle
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(Integer, nullable=False, index=True)  # unix seconds; slides while in use
+
+ORDER_STATUSES = ["open","picking","packed","shipped","closed"]
+
+# Cold copies of finished orders and receipts in the attached archive database (wms.archive).
+# Same columns, no foreign keys (SQLite cannot reference across files); refs are indexed
+# rather than unique since a ref may be reused once its order has left the hot table.
+# Statuses are indexed for the status-filtered history exports (wms.export).
+archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+
+def _cold(table):
+    cols = [Column(c.name, c.type, primary_key=c.primary_key, index=bool(c.foreign_keys) or c.name in ("ref", "status"))
+            for c in table.columns]
+    return Table(table.name, archive_metadata, *cols)
+
+ARCHIVE_TABLES = {t.name: _cold(t) for t in (Order.__table__, OrderLine.__table__, Shipment.__table__,
+                                              Receipt.__table__, ReceiptLine.__table__)}
@@ -0,0 +1,54 @@
+"""Order lifecycle after picking: pack, ship and close.
+
+Each function works in the caller's transaction (use run_transaction), keeps the
+KPI counters and stock reservations in step, and returns the new status, so the
+Streamlit pages and the scanner API apply the same rules.
+"""
+from datetime import datetime
+from sqlalchemy import select, func
+
+from wms.allocation import allocate, release_order
+from wms.kpi import bump_kpi, set_order_status
+from wms.models import Order, OrderLine, Shipment
+
+class OrderError(ValueError):
+    """An order transition was rejected (e.g. packing before everything is picked)."""
+
+def _get(session, order_id):
+    order = session.get(Order, order_id)
+    if order is None:
+        raise LookupError(f"Unknown order {order_id}")
+    return order
+
+def _finish(session, order, status):
+    """Release the order's reservations, set status, and hand the stock to waiting lines."""
+    item_ids = release_order(session, order.id)
+    set_order_status(session, order, status)
+    if item_ids:
+        session.flush()  # allocate() must see the order out of open/picking
+        allocate(session, item_ids)
+
+def pack_order(session, order_id):
+    order = _get(session, order_id)
+    if session.scalar(select(func.count(OrderLine.id)).where(OrderLine.order_id==order_id, OrderLine.picked_qty < OrderLine.qty)):
+        raise OrderError("Cannot pack: some lines not fully picked.")
+    set_order_status(session, order, "packed")
+    return order.status
+
+def ship_order(session, order_id, carrier=None, tracking_no=None):
+    """Record a shipment, update fulfillment KPIs and re-allocate leftover reservations."""
+    order = _get(session, order_id)
+    session.add(Shipment(order_id=order.id, carrier=carrier or None, tracking_no=tracking_no or None))
+    if order.shipped_at is None:
+        bump_kpi(session, "fulfilled", 1)
+    else:
+        bump_kpi(session, "fulfill_seconds", -int(round((order.shipped_at - order.created_at).total_seconds())))
+    order.shipped_at = datetime.utcnow()
+    bump_kpi(session, "fulfill_seconds", int(round((order.shipped_at - order.created_at).total_seconds())))
+    _finish(session, order, "shipped")
+    return order.status
+
+def close_order(session, order_id):
+    order = _get(session, order_id)
+    _finish(session, order, "closed")
+    return order.status
@@ -0,0 +1,218 @@
+"""Query-plan audit: EXPLAIN QUERY PLAN for every statement the app issues.
+
+Builds (or reuses) the benchmark dataset for --scale and, on a scratch copy of it
+(wms.bench.prepare_db, so the dataset is left as it was), drives a workload that
+covers the Streamlit pages (headless, as in wms.bench), the page queries with
+filters and later keyset pages, the scanner API, stock transactions, replenishment
+and an archive batch (rolled back). Every distinct statement is explained on the
+connection that ran it, at the moment it ran (temp tables and all). The audit fails
+when a plan scans a table with more than --max-rows rows, unless the statement
+is in ALLOWED_SCANS:
+
+    python -m wms.planaudit --scale 1.0 --max-rows 1000
+    python -m wms.planaudit --scale 0.1 --verbose     # print every plan
+
+"SCAN t USING [COVERING] INDEX" reads the whole index and counts as a scan, except
+for a walk that LIMIT stops early: ORDER BY served by the index (no temp B-tree) and
+either no WHERE clause or a partial index that is the WHERE clause (first pages of
+the keyset-paginated tables). SEARCH never counts.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+
+from wms.bench import PAGES, bench_pages, bench_transactions, prepare_db
+
+DEFAULT_MAX_ROWS = 1000
+# Full scans that are the point of the statement, or run once per version/process.
+# (regex on the normalized SQL, reason)
+ALLOWED_SCANS = [
+    (r"^SELECT items\.id, items\.sku, items\.name, items\.barcode, items\.bin_location, items\.reorder_point FROM items ORDER BY",
+     "catalog cache load, once per catalog_version (wms.catalog)"),
+    (r"^SELECT items\.id, items\.on_hand, items\.reserved FROM items$", "stock cache load, once per stock_version (wms.catalog)"),
+    (r"^SELECT count\(items\.id\) AS count_1 FROM items$", "Inventory pager total without a search filter"),
+    (r"^SELECT \? AS anon_\d+, coalesce\(sum\(items\.on_hand\)", "KPI rebuild (startup / after bulk changes)"),
+]
+_PLAN_SCAN = re.compile(r"^SCAN ([\w.]+)(?: USING (?:COVERING )?INDEX (\w+))?")
+_FROM = re.compile(r"\b(?:FROM|JOIN)\s+(?:(\w+)\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+_LIMIT = re.compile(r"\bLIMIT\b", re.I)
+_WHERE = re.compile(r"\bWHERE\b", re.I)
+
+class Capture:
+    """Explains each distinct statement the first time it runs on the bound engine."""
+
+    def __init__(self, bind):
+        from wms.profiling import normalize_sql  # imports wms.db; only once prepare_db() has set WMS_DB_URL
+        self.bind = bind
+        self.normalize = normalize_sql
+        self.plans = {}  # normalized sql -> (sql, [plan detail lines] or error string, count)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        key = self.normalize(statement)
+        hit = self.plans.get(key)
+        if hit is not None:
+            hit[2] += 1
+            return
+        if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return
+        params = parameters[0] if executemany and parameters else parameters
+        try:
+            rows = conn.connection.driver_connection.execute("EXPLAIN QUERY PLAN " + statement, params or ()).fetchall()
+            plan = [detail for *_, detail in rows]
+        except Exception as e:
+            plan = f"not explained: {e}"
+        self.plans[key] = [statement, plan, 1]
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._on_execute)
+
+def partial_indexes(bind):
+    with bind.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type='index' AND sql LIKE '% WHERE %'")).scalars())
+
+def table_rows(bind):
+    """{table: rows} for main and archive tables (archive ones as archive.<name>, as plans name them)."""
+    counts = {}
+    with bind.connect() as conn:
+        for schema in ("main", "archive"):
+            names = conn.execute(text(f"SELECT name FROM {schema}.sqlite_master WHERE type='table' "
+                                      "AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'")).scalars().all()
+            for name in names:
+                if name.startswith("items_fts_"):
+                    continue
+                n = conn.execute(text(f'SELECT COUNT(*) FROM {schema}."{name}"')).scalar()
+                counts[name if schema == "main" else f"archive.{name}"] = n
+    return counts
+
+def _bounded(sql, plan, index, partial):
+    """An index walk in ORDER BY order that LIMIT cuts short."""
+    return (index is not None and _LIMIT.search(sql) and not any("TEMP B-TREE" in d for d in plan)
+            and (index in partial or not _WHERE.search(sql)))
+
+def scans(sql, plan, rows, partial=()):
+    """[(table, index or None, rows)] for each full scan in a plan."""
+    aliases = {}
+    for schema, name, alias in _FROM.findall(sql):
+        table = f"{schema}.{name}" if schema else name
+        aliases.setdefault(table, table)
+        if alias and alias.upper() not in ("ON", "WHERE", "GROUP", "ORDER", "HAVING", "LEFT", "INNER", "CROSS", "JOIN", "UNION", "LIMIT"):
+            aliases[alias] = table
+    out = []
+    for detail in plan:
+        m = _PLAN_SCAN.match(detail)
+        if m and not _bounded(sql, plan, m.group(2), partial):
+            table = aliases.get(m.group(1), m.group(1))
+            if table in rows:
+                out.append((table, m.group(2), rows[table]))
+    return out
+
+def allowed(key):
+    for pattern, reason in ALLOWED_SCANS:
+        if re.search(pattern, key):
+            return reason
+    return None
+
+def workload(capture, seed=42):
+    """Exercise the app, the API and the background jobs once, explaining under capture."""
+    from sqlalchemy import select
+    from wms.db import SessionLocal
+    from wms.models import Item, Order
+    with SessionLocal() as s:  # sample keys; not app queries
+        sku, barcode = s.execute(select(Item.sku, Item.barcode).where(Item.barcode.is_not(None)).limit(1)).one()
+        ref = s.scalar(select(Order.ref).order_by(Order.id.desc()).limit(1))
+        order_id = s.scalar(select(Order.id).where(Order.status=="packed").limit(1))
+    with capture:
+        _app(sku, barcode, ref, order_id, seed)
+
+def _app(sku, barcode, ref, order_id, seed):
+    from wms.api import ScannerAPI
+    from wms.archive import archive_orders, archive_receipts
+    from wms.db import SessionLocal, engine
+    from wms.export import iter_export
+    from wms.kpi import load_kpis, rebuild_kpi_counters
+    from wms.models import ORDER_STATUSES
+    from wms.queries import load_low_stock_page, load_orders_page, load_receipts_page
+    from wms.replenish import process_events
+    from wms.search import INVENTORY_SORTS, search_items
+    bench_pages(1, PAGES)
+    bench_transactions(20, seed)
+    with SessionLocal() as s:
+        load_kpis(s); rebuild_kpi_counters(s)
+        for q in (None, sku, sku[:2], "tem 1"):
+            for sort in INVENTORY_SORTS:
+                page, _ = search_items(s, q, sort)
+                if page.next_key:
+                    search_items(s, q, sort, page.next_key)
+        for status in [None] + ORDER_STATUSES:
+            page = load_orders_page(s, status)
+            if page.next_key:
+                load_orders_page(s, status, page.next_key)
+        for status in (None, "open", "draft"):
+            page = load_receipts_page(s, status)
+            if page.next_key:
+                load_receipts_page(s, status, page.next_key)
+        page = load_low_stock_page(s)
+        if page.next_key:
+            load_low_stock_page(s, page.next_key)
+        for name in ("order_lines", "receipt_lines"):  # filtered, first chunk (unfiltered exports read everything)
+            next(iter(iter_export(s, name, "csv", status="open", chunksize=100)))
+    api = ScannerAPI(engine)
+    api.handle("GET", f"/items/{barcode}", {}); api.handle("GET", f"/items/{sku}", {}); api.handle("GET", f"/orders/{ref}", {})
+    if order_id:
+        api.handle("POST", f"/orders/{order_id}/ship", {"carrier": "audit"})
+    with SessionLocal() as s:  # background jobs; leave the data as it was
+        process_events(s, 50)
+        cutoff = datetime.utcnow() - timedelta(days=30)
+        archive_orders(s, cutoff, 50); archive_receipts(s, cutoff, 50)
+        s.rollback()
+
+def audit(max_rows=DEFAULT_MAX_ROWS, scale=0.1, seed=42, db=None):
+    """(findings, capture, table rows); findings are (key, [(table, index, rows)], allowed reason)."""
+    db = db or os.path.join(tempfile.gettempdir(), f"wms-bench-sf{scale:g}-seed{seed}.db")
+    prepare_db(db, scale, seed)
+    from wms.db import engine
+    cap = Capture(engine)
+    workload(cap, seed)
+    rows, partial = table_rows(engine), partial_indexes(engine)
+    findings = []
+    for key, (sql, plan, _) in cap.plans.items():
+        if isinstance(plan, str):
+            continue
+        big = [s for s in scans(sql, plan, rows, partial) if s[2] > max_rows]
+        if big:
+            findings.append((key, big, allowed(key)))
+    return findings, cap, rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Fail when an app query scans a large table.")
+    ap.add_argument("--scale", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", help="dataset file (generated if missing; the audit uses a scratch copy)")
+    ap.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help="largest table a plan may scan")
+    ap.add_argument("--verbose", action="store_true", help="print every statement and its plan")
+    args = ap.parse_args(argv)
+    findings, cap, rows = audit(args.max_rows, args.scale, args.seed, args.db)
+    if args.verbose:
+        for key, (sql, plan, n) in sorted(cap.plans.items()):
+            print(f"[{n}x] {key[:200]}")
+            for line in ([plan] if isinstance(plan, str) else plan):
+                print(f"      {line}")
+    failed = [f for f in findings if not f[2]]
+    for key, big, reason in findings:
+        where = ", ".join(f"{t} ({ix or 'table'}, {n:,} rows)" for t, ix, n in big)
+        print(f"{'allowed' if reason else 'SCAN':8} {where}\n         {key[:300]}" + (f"\n         -> {reason}" if reason else ""))
+    print(f"{len(cap.plans)} statements, {len(findings) - len(failed)} allowed scans, {len(failed)} failing "
+          f"(tables over {args.max_rows:,} rows: {', '.join(t for t, n in sorted(rows.items()) if n > args.max_rows)})")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
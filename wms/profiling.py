@@ -0,0 +1,192 @@
+"""Per-rerun instrumentation: SQL statement timing, nested spans and loaded objects.
+
+While enabled, engine cursor events time every statement and attribute it to the
+rerun running in the current thread (each Streamlit session reruns in its own
+thread). Page handlers and SessionLocal() blocks are recorded as nested spans.
+Finished reruns go into an in-memory ring buffer for the admin Performance page,
+and they are also appended as JSON lines to WMS_PROFILE_LOG when that is set.
+
+While disabled, no listeners are attached. rerun() and span() then return a shared
+no-op context, so the instrumented code pays one attribute check.
+
+    WMS_PROFILE=1 WMS_PROFILE_LOG=profile.jsonl streamlit run app.py
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
+
+from wms.db import Session, engine
+
+HISTORY = 200
+TOP_STATEMENTS = 10
+LOG_PATH = os.environ.get("WMS_PROFILE_LOG") or None
+
+_NULL = nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY)
+_state = {"enabled": False, "bind": None}
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def normalize_sql(sql):
+    """Statement shape for grouping: literals -> ?, IN lists collapsed, whitespace squeezed."""
+    sql = _LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(?, ...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+class RerunStats:
+    """What one rerun (or any profiled block) did: wall time, SQL and spans."""
+    __slots__ = ("label", "user", "started", "wall_ms", "queries", "db_ms", "objects", "spans", "statements", "_depth")
+
+    def __init__(self, label, user=None):
+        self.label, self.user = label, user
+        self.started = time.time()
+        self.wall_ms = self.db_ms = 0.0
+        self.queries = self.objects = 0
+        self.spans = []         # [name, depth, ms, queries]
+        self.statements = {}    # normalized sql -> [count, total_ms, max_ms]
+        self._depth = 0
+
+    def add_statement(self, sql, ms):
+        self.queries += 1
+        self.db_ms += ms
+        st = self.statements.get(sql)
+        if st is None:
+            self.statements[sql] = [1, ms, ms]
+        else:
+            st[0] += 1; st[1] += ms
+            if ms > st[2]:
+                st[2] = ms
+
+    def slowest(self, n=TOP_STATEMENTS):
+        rows = sorted(self.statements.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+        return [{"sql": sql, "count": c, "total_ms": round(t, 3), "max_ms": round(m, 3)} for sql, (c, t, m) in rows]
+
+    def to_dict(self):
+        return {"label": self.label, "user": self.user, "started": round(self.started, 3),
+                "wall_ms": round(self.wall_ms, 3), "queries": self.queries, "db_ms": round(self.db_ms, 3),
+                "objects": self.objects,
+                "spans": [{"name": n, "depth": d, "ms": round(ms, 3), "queries": q} for n, d, ms, q in self.spans],
+                "slowest": self.slowest()}
+
+# ---------- event hooks (attached only while enabled) ----------
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, "stats", None) is not None:
+        conn.info.setdefault("wms_profile_t0", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        return
+    starts = conn.info.get("wms_profile_t0")
+    if starts:
+        stats.add_statement(normalize_sql(statement), (time.perf_counter() - starts.pop()) * 1000.0)
+
+def _on_load(target, context):
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        stats.objects += 1
+
+def _session_span(frame):
+    if getattr(_local, "stats", None) is None:
+        return _NULL
+    return span(f"session {os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}")
+
+def enable(bind=None):
+    """Attach the listeners (process-wide); idempotent."""
+    with _lock:
+        if _state["enabled"]:
+            return
+        bind = bind if bind is not None else engine
+        event.listen(bind, "before_cursor_execute", _before_execute)
+        event.listen(bind, "after_cursor_execute", _after_execute)
+        event.listen(Mapper, "load", _on_load)
+        Session.span_factory = _session_span
+        _state.update(enabled=True, bind=bind)
+
+def disable():
+    with _lock:
+        if not _state["enabled"]:
+            return
+        event.remove(_state["bind"], "before_cursor_execute", _before_execute)
+        event.remove(_state["bind"], "after_cursor_execute", _after_execute)
+        event.remove(Mapper, "load", _on_load)
+        Session.span_factory = None
+        _state.update(enabled=False, bind=None)
+
+def is_enabled():
+    return _state["enabled"]
+
+# ---------- recording ----------
+@contextmanager
+def _rerun(label, user):
+    stats = _local.stats = RerunStats(label, user)
+    t0 = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.wall_ms = (time.perf_counter() - t0) * 1000.0
+        _local.stats = None
+        _history.append(stats)
+        if LOG_PATH:
+            line = json.dumps(stats.to_dict())
+            with _lock, open(LOG_PATH, "a") as f:
+                f.write(line + "\n")
+
+def rerun(label, user=None):
+    """Profile a whole rerun in this thread; a no-op while disabled or when already inside one."""
+    if not _state["enabled"] or getattr(_local, "stats", None) is not None:
+        return _NULL
+    return _rerun(label, user)
+
+@contextmanager
+def _span(stats, name):
+    depth = stats._depth
+    entry = [name, depth, 0.0, stats.queries]
+    stats.spans.append(entry)
+    stats._depth = depth + 1
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry[2] = (time.perf_counter() - t0) * 1000.0
+        entry[3] = stats.queries - entry[3]
+        stats._depth = depth
+
+def span(name):
+    """Time a nested block within the current rerun (no-op outside one)."""
+    stats = getattr(_local, "stats", None)
+    return _NULL if stats is None else _span(stats, name)
+
+# ---------- reading ----------
+def history():
+    """Finished reruns, newest first."""
+    return list(reversed(_history))
+
+def clear():
+    _history.clear()
+
+def top_statements(reruns, n=TOP_STATEMENTS):
+    """Statement shapes aggregated over reruns, by total time."""
+    agg = {}
+    for r in reruns:
+        for sql, (c, t, m) in r.statements.items():
+            a = agg.setdefault(sql, [0, 0.0, 0.0])
+            a[0] += c; a[1] += t; a[2] = max(a[2], m)
+    rows = sorted(agg.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+    return [{"sql": sql, "count": c, "total_ms": round(t, 3), "max_ms": round(m, 3)} for sql, (c, t, m) in rows]
+
+def to_jsonl(reruns):
+    return "".join(json.dumps(r.to_dict()) + "\n" for r in reruns)
+
+if os.environ.get("WMS_PROFILE", "") not in ("", "0"):
+    enable()
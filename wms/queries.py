@@ -0,0 +1,66 @@
+from collections import namedtuple
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import selectinload
+
+from wms.catalog import item_options
+from wms.kpi import load_kpis
+from wms.models import Item, Order, OrderLine, Receipt, ReceiptLine, ORDER_STATUSES
+
+Page = namedtuple("Page", "rows next_key")  # next_key: pass as `after` for the next page; None on the last page
+
+def keyset_page(session, stmt, keys, after=None, page_size=50, descending=False, scalars=False):
+    """One page of stmt ordered by keys (unique together), starting after the key tuple `after`.
+
+    Seeks through the index on keys instead of OFFSET, so the last page costs the same
+    as the first. One extra row is fetched to tell whether another page follows.
+    """
+    n = len(keys)
+    if after is not None:
+        lhs, rhs = (keys[0], after[0]) if n == 1 else (tuple_(*keys), tuple_(*after))
+        stmt = stmt.where(lhs < rhs if descending else lhs > rhs)
+        if n > 1:  # SQLite seeks expression indexes on a plain range only, not on the row value
+            stmt = stmt.where(keys[0] <= after[0] if descending else keys[0] >= after[0])
+    stmt = stmt.add_columns(*keys).order_by(*(k.desc() for k in keys) if descending else keys).limit(page_size + 1)
+    res = session.execute(stmt).all()
+    next_key = tuple(res[page_size - 1][-n:]) if len(res) > page_size else None
+    res = res[:page_size]
+    return Page([r[0] for r in res] if scalars else [tuple(r[:-n]) for r in res], next_key)
+
+# ---------- Dashboard ----------
+LOW_STOCK_PAGE_SIZE = 50
+
+def load_low_stock_page(session, after=None, page_size=LOW_STOCK_PAGE_SIZE):
+    """(sku, name, on_hand, reorder_point) of items at or below their reorder point, by SKU."""
+    qry = select(Item.sku, Item.name, Item.on_hand, Item.reorder_point).where(Item.on_hand <= Item.reorder_point)
+    return keyset_page(session, qry, [Item.sku], after, page_size)
+
+# ---------- Orders ----------
+ORDERS_PAGE_SIZE = 20
+# kpi counters + orders + lines + line items + catalog version check,
+# plus catalog/stock reloads on the first render after items or stock change
+ORDERS_PAGE_QUERY_BUDGET = 7
+
+def count_orders(session, status=None):
+    kpi = load_kpis(session)
+    return sum(kpi.get(f"orders:{stt}", 0) for stt in ([status] if status else ORDER_STATUSES))
+
+def load_orders_page(session, status=None, after=None, page_size=ORDERS_PAGE_SIZE):
+    """Page of orders (newest first) with lines and line items eager-loaded; seeks on (status,) created_at, id."""
+    qry = select(Order).options(selectinload(Order.lines).selectinload(OrderLine.item))
+    if status:
+        qry = qry.where(Order.status==status)
+    return keyset_page(session, qry, [Order.created_at, Order.id], after, page_size, descending=True, scalars=True)
+
+def load_item_options(session, with_stock=True):
+    """Label -> item id for line pickers, from the shared catalog cache (with available-to-promise)."""
+    return item_options(session, with_stock=with_stock)
+
+# ---------- Inbound ----------
+RECEIPTS_PAGE_SIZE = 20
+
+def load_receipts_page(session, status=None, after=None, page_size=RECEIPTS_PAGE_SIZE):
+    """Page of receipts (newest first) with lines and line items eager-loaded."""
+    qry = select(Receipt).options(selectinload(Receipt.lines).selectinload(ReceiptLine.item))
+    if status:
+        qry = qry.where(Receipt.status==status)
+    return keyset_page(session, qry, [Receipt.created_at, Receipt.id], after, page_size, descending=True, scalars=True)
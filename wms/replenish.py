@@ -0,0 +1,134 @@
+"""Low-stock alerts and suggested replenishment, off the picker's transaction.
+
+A trigger on items records every item whose on_hand change leaves it at or below
+its reorder point in stock_events (one row per item, so a burst of picks on the
+same SKU is one event). Picks and receipts pay for one primary-key INSERT OR IGNORE,
+and only when the item is low. A worker drains the table in batches, re-checks the
+rule for just those items and adds draft receipt lines that bring each item up to
+ORDER_UP_TO x its reorder point, counting stock already inbound on draft/open
+receipts. Drafts collect on one receipt until someone approves it on the Inbound page.
+
+    python -m wms.replenish             # worker: poll every --interval seconds
+    python -m wms.replenish --once      # drain pending events and exit (cron)
+
+WMS_REPLENISH=1 also runs the worker as a thread inside the Streamlit process.
+"""
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import delete, func, select, text
+
+from wms.models import Item, Receipt, ReceiptLine, StockEvent
+
+DEFAULT_BATCH = 500
+DEFAULT_INTERVAL = 2.0
+ORDER_UP_TO = 2  # suggest enough to reach this multiple of the reorder point
+REPLENISH_VENDOR = "replenishment"
+
+_EVENT = ("INSERT OR IGNORE INTO stock_events (item_id, ts) "
+          "VALUES (new.id, CAST(strftime('%s', 'now') AS INTEGER));")
+LOW_STOCK_TRIGGER_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS items_low_stock_au AFTER UPDATE OF on_hand, reorder_point ON items
+        WHEN new.reorder_point > 0 AND new.on_hand <= new.reorder_point BEGIN {_EVENT} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS items_low_stock_ai AFTER INSERT ON items
+        WHEN new.reorder_point > 0 AND new.on_hand <= new.reorder_point BEGIN {_EVENT} END""",
+]
+
+def ensure_low_stock_triggers(bind):
+    """Create the trigger and queue the items that are already low."""
+    with bind.begin() as conn:
+        for ddl in LOW_STOCK_TRIGGER_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text("INSERT OR IGNORE INTO stock_events (item_id, ts) "
+                          "SELECT id, CAST(strftime('%s', 'now') AS INTEGER) FROM items "
+                          "WHERE reorder_point > 0 AND on_hand <= reorder_point"))
+
+def _draft_receipt(session):
+    rec = session.scalars(select(Receipt).where(Receipt.status=="draft", Receipt.vendor==REPLENISH_VENDOR)
+                          .order_by(Receipt.id.desc()).limit(1)).first()
+    if rec is None:
+        rec = Receipt(ref=f"REPL-{datetime.utcnow():%Y%m%d-%H%M%S-%f}", vendor=REPLENISH_VENDOR, status="draft")
+        session.add(rec); session.flush()
+    return rec
+
+def process_events(session, batch=DEFAULT_BATCH):
+    """Evaluate one batch of queued items (caller commits).
+
+    Returns (events dequeued, [(sku, on_hand, reorder_point, suggested_qty)] for items
+    still low); suggested_qty is 0 when enough is already inbound. Fewer than batch
+    events dequeued means the queue is empty.
+    """
+    ids = session.scalars(select(StockEvent.item_id).order_by(StockEvent.ts).limit(batch)).all()
+    if not ids:
+        return 0, []
+    session.execute(delete(StockEvent).where(StockEvent.item_id.in_(ids)))
+    inbound = (select(ReceiptLine.item_id, func.sum(ReceiptLine.qty - ReceiptLine.received_qty).label("qty"))
+               .join(Receipt, Receipt.id==ReceiptLine.receipt_id)
+               .where(Receipt.status.in_(["draft", "open"]), ReceiptLine.item_id.in_(ids))
+               .group_by(ReceiptLine.item_id).subquery())
+    rows = session.execute(select(Item.id, Item.sku, Item.on_hand, Item.reorder_point, func.coalesce(inbound.c.qty, 0))
+                           .outerjoin(inbound, inbound.c.item_id==Item.id)
+                           .where(Item.id.in_(ids), Item.reorder_point > 0, Item.on_hand <= Item.reorder_point)
+                           .order_by(Item.sku)).all()
+    alerts, lines = [], []
+    for iid, sku, on_hand, rop, incoming in rows:
+        qty = max(0, rop * ORDER_UP_TO - on_hand - incoming)
+        alerts.append((sku, on_hand, rop, qty))
+        if qty:
+            lines.append((iid, qty))
+    if lines:
+        rec = _draft_receipt(session)
+        session.add_all([ReceiptLine(receipt_id=rec.id, item_id=iid, qty=qty) for iid, qty in lines])
+    return len(ids), alerts
+
+def drain(batch=DEFAULT_BATCH, report=print):
+    """Process queued events until none are left; returns (events drained, items still low)."""
+    from wms.db import run_transaction
+    drained = low = 0
+    while True:
+        n, alerts = run_transaction(process_events, batch)
+        for sku, on_hand, rop, qty in alerts:
+            report(f"low stock: {sku} on_hand {on_hand} <= {rop}" + (f"; drafted {qty} for receipt" if qty else "; enough inbound"))
+        drained += n
+        low += len(alerts)
+        if n < batch:
+            return drained, low
+
+def run(interval=DEFAULT_INTERVAL, batch=DEFAULT_BATCH, stop=None, report=print):
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            drain(batch, report)
+        except Exception as e:  # keep polling; the events stay queued
+            report(f"replenish: {e!r}")
+        stop.wait(interval)
+
+def start_worker(interval=DEFAULT_INTERVAL, batch=DEFAULT_BATCH, report=print):
+    """Run the worker on a daemon thread; set the returned Event to stop it."""
+    stop = threading.Event()
+    threading.Thread(target=run, args=(interval, batch, stop, report), name="wms-replenish", daemon=True).start()
+    return stop
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Low-stock alerts and draft replenishment receipts.")
+    ap.add_argument("--once", action="store_true", help="drain pending events and exit")
+    ap.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between polls")
+    ap.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="items per transaction")
+    args = ap.parse_args(argv)
+    from wms.bootstrap import ensure_db
+    ensure_db()
+    if args.once:
+        t0 = time.perf_counter()
+        drained, low = drain(args.batch)
+        print(f"{drained} queued items evaluated, {low} still low, in {time.perf_counter() - t0:.2f}s")
+        return 0
+    try:
+        run(args.interval, args.batch, report=lambda msg: print(msg, flush=True))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+from sqlalchemy import select, func, literal_column, or_, text
+from sqlalchemy.exc import OperationalError
+
+from wms.models import Item
+from wms.queries import Page, keyset_page
+
+INVENTORY_COLUMNS = ["sku","name","barcode","bin_location","reorder_point","on_hand","reserved"]
+INVENTORY_PAGE_SIZE = 100
+BIN_KEY = func.coalesce(Item.bin_location, literal_column("''"))  # same expression as ix_items_bin_id
+# Sort choices -> keyset columns (unique together); each has a matching index on items (see Item).
+INVENTORY_SORTS = {
+    "sku": [Item.sku],
+    "name": [Item.name, Item.id],
+    "bin_location": [BIN_KEY, Item.id],
+}
+SEARCH_FTS = {"enabled": None}  # None: not checked yet in this process
+
+# External-content FTS5 table over items; triggers keep it in sync on insert/update/delete.
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(sku, name, barcode, content='items', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+         INSERT INTO items_fts(rowid, sku, name, barcode) VALUES (new.id, new.sku, new.name, new.barcode); END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+         INSERT INTO items_fts(items_fts, rowid, sku, name, barcode) VALUES ('delete', old.id, old.sku, old.name, old.barcode); END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF sku, name, barcode ON items BEGIN
+         INSERT INTO items_fts(items_fts, rowid, sku, name, barcode) VALUES ('delete', old.id, old.sku, old.name, old.barcode);
+         INSERT INTO items_fts(rowid, sku, name, barcode) VALUES (new.id, new.sku, new.name, new.barcode); END""",
+]
+
+def ensure_search_index(bind):
+    """Create the FTS5 index (and backfill it) if missing; falls back to LIKE search without FTS5."""
+    try:
+        with bind.begin() as conn:
+            existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name='items_fts'")).first()
+            for ddl in SEARCH_INDEX_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                conn.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
+        SEARCH_FTS["enabled"] = True
+    except OperationalError:
+        SEARCH_FTS["enabled"] = False
+
+def _fts_enabled(session):
+    if SEARCH_FTS["enabled"] is None:  # schema set up by an earlier process (see wms.migrations)
+        SEARCH_FTS["enabled"] = session.scalar(text("SELECT 1 FROM sqlite_master WHERE name='items_fts'")) is not None
+    return SEARCH_FTS["enabled"]
+
+def search_filter(session, q):
+    """WHERE clause for a free-text inventory search (None for no filter); see search_items."""
+    if not q:
+        return None
+    if len(q) < 3:
+        return or_(Item.sku.between(q, q + "\uffff"), Item.barcode.between(q, q + "\uffff"))
+    if _fts_enabled(session):
+        match = select(text("rowid")).select_from(text("items_fts")).where(text("items_fts MATCH :q"))
+        return Item.id.in_(match.params(q='"' + q.replace('"', '""') + '"'))
+    like = f"%{q}%"
+    return or_(Item.sku.ilike(like), Item.name.ilike(like), Item.barcode.ilike(like))
+
+def search_items(session, q=None, sort="sku", after=None, page_size=INVENTORY_PAGE_SIZE, descending=False):
+    """One keyset page of inventory rows (tuples in INVENTORY_COLUMNS order); returns (Page, total).
+
+    Exact SKU/barcode hits resolve through the unique indexes. Otherwise queries of
+    3+ characters use the trigram FTS index (substring match); shorter ones are SKU/barcode prefixes.
+    Rows are ordered by one of INVENTORY_SORTS, each backed by an index on items.
+    """
+    cols = [getattr(Item, c) for c in INVENTORY_COLUMNS]
+    if q:
+        exact = session.execute(select(*cols).where(or_(Item.sku==q, Item.barcode==q))).all()
+        if exact:
+            return Page([tuple(r) for r in exact], None), len(exact)
+    cond = search_filter(session, q)
+    qry, count = select(*cols), select(func.count(Item.id))
+    if cond is not None:
+        qry, count = qry.where(cond), count.where(cond)
+    page = keyset_page(session, qry, INVENTORY_SORTS[sort], after, page_size, descending)
+    return page, session.scalar(count)
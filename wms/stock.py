@@ -0,0 +1,102 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, func, bindparam
+
+from wms import ledger
+from wms.allocation import allocate
+from wms.kpi import bump_kpi, set_order_status
+from wms.models import Item, OrderLine, Receipt, ReceiptLine, InventoryMovement
+
+class StockError(ValueError):
+    """A stock mutation was rejected (e.g. it would take on_hand below zero)."""
+
+_it, _ol = Item.__table__, OrderLine.__table__
+_line_item = select(_ol.c.item_id).where(_ol.c.id==bindparam("b_line")).scalar_subquery()
+_consumed = func.min(bindparam("b_qty"), select(_ol.c.allocated_qty).where(_ol.c.id==bindparam("b_line")).scalar_subquery())
+_PICK_ITEM = (_it.update()
+              .where(_it.c.id==_line_item, _it.c.on_hand >= bindparam("b_qty"),
+                     _it.c.on_hand - bindparam("b_qty") >= _it.c.reserved - _consumed)
+              .values(on_hand=_it.c.on_hand - bindparam("b_qty"), reserved=_it.c.reserved - _consumed))
+_PICK_LINE = (_ol.update().where(_ol.c.id==bindparam("b_line"))
+              .values(picked_qty=_ol.c.picked_qty + bindparam("b_qty"),
+                      allocated_qty=_ol.c.allocated_qty - func.min(bindparam("b_qty"), _ol.c.allocated_qty)))
+
+def pick_line(session, line_id, qty):
+    """Pick qty for an order line in the caller's transaction.
+
+    Stock is taken with a single conditional UPDATE, so concurrent pickers can neither
+    lose updates nor drive on_hand negative. The line's own reservation is consumed
+    first; anything beyond it must come from unreserved stock.
+    """
+    qty = int(qty)
+    if qty <= 0:
+        raise StockError("Pick quantity must be positive")
+    params = {"b_line": line_id, "b_qty": qty}
+    res = session.connection().execute(_PICK_ITEM, params)
+    if res.rowcount != 1:
+        if session.get(OrderLine, line_id) is None:
+            raise LookupError(f"Unknown order line {line_id}")
+        raise StockError("Not enough stock to pick")
+    session.connection().execute(_PICK_LINE, params)
+    bump_kpi(session, "on_hand", -qty)
+    line = session.get(OrderLine, line_id)
+    ledger.record(session, [(line.item_id, ledger.PICK, -qty, line_id)])
+    order = line.order
+    set_order_status(session, order, "picking"); order.picked_at = datetime.utcnow()
+    return qty
+
+def receive_lines(session, quantities):
+    """Apply {receipt_line_id: qty} in the caller's transaction with one batched UPDATE per table,
+    then allocate the received items to waiting order lines. Only open receipts can be received:
+    drafts (suggested replenishment) must be approved first."""
+    quantities = {int(lid): int(q) for lid, q in quantities.items() if q and int(q) > 0}
+    if not quantities:
+        return 0
+    found = session.execute(select(ReceiptLine.id, ReceiptLine.item_id, Receipt.ref, Receipt.status)
+                            .join(Receipt, Receipt.id==ReceiptLine.receipt_id).where(ReceiptLine.id.in_(quantities))).all()
+    if len(found) != len(quantities):
+        missing = sorted(set(quantities) - {lid for lid, *_ in found})
+        raise LookupError(f"Unknown receipt line(s) {missing}")
+    closed = sorted({(ref, status) for _, _, ref, status in found if status != "open"})
+    if closed:
+        raise StockError("Only open receipts can be received: " + ", ".join(f"{ref} is {status}" for ref, status in closed))
+    rows = [(lid, iid) for lid, iid, *_ in found]
+    per_item = defaultdict(int)
+    for lid, iid in rows:
+        per_item[iid] += quantities[lid]
+    rl, it = ReceiptLine.__table__, Item.__table__
+    session.execute(rl.update().where(rl.c.id==bindparam("b_id")).values(received_qty=rl.c.received_qty + bindparam("b_qty")),
+                    [{"b_id": lid, "b_qty": quantities[lid]} for lid, _ in rows])
+    session.execute(it.update().where(it.c.id==bindparam("b_id")).values(on_hand=it.c.on_hand + bindparam("b_qty")),
+                    [{"b_id": iid, "b_qty": q} for iid, q in per_item.items()])
+    ledger.record(session, [(iid, ledger.RECEIVE, quantities[lid], lid) for lid, iid in rows])
+    total = sum(per_item.values())
+    bump_kpi(session, "on_hand", total)
+    allocate(session, per_item)  # new stock goes to waiting order lines first
+    return total
+
+def adjust_stock(session, item_id, delta, kind=ledger.ADJUST, ref_id=None):
+    """Apply a signed stock correction in the caller's transaction; cannot cut into reserved stock."""
+    delta = int(delta)
+    if not delta:
+        raise StockError("Adjustment cannot be zero")
+    it = Item.__table__
+    res = session.execute(it.update().where(it.c.id==item_id, it.c.on_hand + delta >= it.c.reserved)
+                          .values(on_hand=it.c.on_hand + delta))
+    if res.rowcount != 1:
+        raise StockError("Adjustment would take stock below zero or below reserved quantity")
+    ledger.record(session, [(item_id, kind, delta, ref_id)])
+    bump_kpi(session, "on_hand", delta)
+    if delta > 0:
+        allocate(session, [item_id])
+    return delta
+
+def reverse_movement(session, movement_id):
+    """Post the opposite of a ledger movement (stock only; order/receipt lines are untouched)."""
+    mv = session.get(InventoryMovement, movement_id)
+    if mv is None:
+        raise StockError("Unknown movement")
+    if session.scalar(select(InventoryMovement.id).where(InventoryMovement.kind==ledger.REVERSAL,
+                                                          InventoryMovement.ref_id==movement_id)):
+        raise StockError("Movement already reversed")
+    return adjust_stock(session, mv.item_id, -mv.qty, kind=ledger.REVERSAL, ref_id=movement_id)
@@ -0,0 +1,149 @@
+"""Wave planning: batch open orders, consolidate lines per item and sequence the pick path.
+
+Bins are parsed as aisle letters, bay number and level (``A1-01`` -> aisle A, bay 1,
+level 1). The pick path walks aisles in order and alternates bay direction between
+aisles (S-shape routing), so the picker never walks back down an aisle.
+"""
+import re
+from collections import defaultdict
+from sqlalchemy import select, func, insert
+
+from wms.models import Item, Order, OrderLine, Wave, WaveOrder
+from wms.stock import StockError, pick_line
+
+DEFAULT_MAX_ORDERS = 200
+AISLE_CHANGE_COST = 10  # travel units to move to the next aisle, vs 1 per bay
+
+_BIN_RE = re.compile(r"^\s*([A-Za-z]+)\s*(\d+)?(?:\s*[-./ ]\s*(\d+))?")
+
+def parse_bin(loc):
+    """(aisle, bay, level) for a bin label; None when it cannot be parsed."""
+    m = _BIN_RE.match(loc or "")
+    if not m:
+        return None
+    return m.group(1).upper(), int(m.group(2) or 0), int(m.group(3) or 0)
+
+def sequence_stops(rows, bin_of=lambda r: r["bin"]):
+    """Order pick rows along an S-shaped path; rows without a parseable bin go last."""
+    parsed = [(parse_bin(bin_of(r)), r) for r in rows]
+    aisles = sorted({p[0] for p, _ in parsed if p})
+    rank = {a: i for i, a in enumerate(aisles)}
+    def key(pr):
+        p, _ = pr
+        if p is None:
+            return (1, 0, 0, 0)
+        i = rank[p[0]]
+        return (0, i, p[1] if i % 2 == 0 else -p[1], p[2])
+    return [r for _, r in sorted(parsed, key=key)]
+
+def travel_distance(bins):
+    """Rough travel estimate for visiting bins in the given order."""
+    dist, prev = 0, None
+    for b in filter(None, map(parse_bin, bins)):
+        if prev is not None:
+            dist += abs(b[1] - prev[1]) + (AISLE_CHANGE_COST if b[0] != prev[0] else 0)
+        prev = b
+    return dist
+
+class WavePlan:
+    def __init__(self, orders, pick_list, put_wall):
+        self.orders = orders        # [(order_id, ref, slot)]
+        self.pick_list = pick_list  # [{"item_id","sku","name","bin","qty","slots"}] in walk order
+        self.put_wall = put_wall    # [{"slot","order_id","ref","item_id","sku","qty"}]
+
+    @property
+    def units(self):
+        return sum(r["qty"] for r in self.pick_list)
+
+    @property
+    def travel(self):
+        return travel_distance([r["bin"] for r in self.pick_list])
+
+def select_wave_orders(session, max_orders=DEFAULT_MAX_ORDERS, max_lines=None, max_units=None, cutoff=None):
+    """Oldest open orders not already in a wave, filled greedily up to the capacity limits."""
+    in_wave = select(WaveOrder.order_id)
+    # Grouped in ix_orders_status_created_id order, so SQLite streams groups oldest first
+    # without sorting every open order, and stops when the loop below does.
+    qry = (select(Order.id, Order.ref, func.count(OrderLine.id), func.sum(OrderLine.qty - OrderLine.picked_qty))
+           .join(OrderLine, OrderLine.order_id==Order.id)
+           .where(Order.status=="open", Order.id.not_in(in_wave), OrderLine.qty > OrderLine.picked_qty)
+           .group_by(Order.created_at, Order.id).order_by(Order.created_at, Order.id)
+           .execution_options(yield_per=max(max_orders, 100)))
+    if cutoff:
+        qry = qry.where(Order.created_at <= cutoff)
+    chosen, lines, units = [], 0, 0
+    with session.execute(qry) as result:
+        for oid, ref, n_lines, n_units in result:
+            if len(chosen) >= max_orders:
+                break
+            if (max_lines and lines + n_lines > max_lines) or (max_units and units + n_units > max_units):
+                if chosen:
+                    continue  # a smaller later order may still fit
+            chosen.append((oid, ref))
+            lines += n_lines; units += n_units
+    return [(oid, ref, slot) for slot, (oid, ref) in enumerate(chosen, 1)]
+
+def build_plan(session, orders):
+    """Consolidated pick list and put-wall breakdown for [(order_id, ref, slot)]."""
+    if not orders:
+        return WavePlan([], [], [])
+    slot_of = {oid: slot for oid, _, slot in orders}
+    ref_of = {oid: ref for oid, ref, _ in orders}
+    qry = (select(OrderLine.order_id, OrderLine.item_id, Item.sku, Item.name, Item.bin_location,
+                  OrderLine.qty - OrderLine.picked_qty)
+           .join(Item, Item.id==OrderLine.item_id)
+           .where(OrderLine.order_id.in_(list(slot_of)), OrderLine.qty > OrderLine.picked_qty))
+    per_item, put_wall = {}, []
+    for oid, iid, sku, name, bin_loc, qty in session.execute(qry):
+        row = per_item.setdefault(iid, {"item_id": iid, "sku": sku, "name": name, "bin": bin_loc, "qty": 0, "slots": defaultdict(int)})
+        row["qty"] += qty
+        row["slots"][slot_of[oid]] += qty
+        put_wall.append({"slot": slot_of[oid], "order_id": oid, "ref": ref_of[oid], "item_id": iid, "sku": sku, "qty": qty})
+    for row in per_item.values():
+        row["slots"] = dict(sorted(row["slots"].items()))
+    put_wall.sort(key=lambda r: (r["slot"], r["sku"]))
+    return WavePlan(orders, sequence_stops(per_item.values()), put_wall)
+
+def plan_wave(session, max_orders=DEFAULT_MAX_ORDERS, max_lines=None, max_units=None, cutoff=None):
+    return build_plan(session, select_wave_orders(session, max_orders, max_lines, max_units, cutoff))
+
+def release_wave(session, plan):
+    """Persist a planned wave (caller commits); returns the wave id."""
+    wave = Wave(); session.add(wave); session.flush()
+    session.execute(insert(WaveOrder), [{"wave_id": wave.id, "order_id": oid, "slot": slot} for oid, _, slot in plan.orders])
+    return wave.id
+
+def load_wave(session, wave_id):
+    """Current plan for a released wave (only lines still to pick)."""
+    rows = session.execute(select(WaveOrder.order_id, Order.ref, WaveOrder.slot).join(Order, Order.id==WaveOrder.order_id)
+                           .where(WaveOrder.wave_id==wave_id).order_by(WaveOrder.slot)).all()
+    return build_plan(session, [tuple(r) for r in rows])
+
+def confirm_wave_picks(session, wave_id, picked):
+    """Distribute picked units {item_id: qty} to the wave's order lines by slot (caller commits).
+
+    Returns {item_id: shortfall} for items that could not be fully put away.
+    """
+    lines = session.execute(select(OrderLine.id, OrderLine.item_id, OrderLine.qty - OrderLine.picked_qty)
+                            .join(WaveOrder, WaveOrder.order_id==OrderLine.order_id)
+                            .where(WaveOrder.wave_id==wave_id, OrderLine.qty > OrderLine.picked_qty)
+                            .order_by(WaveOrder.slot, OrderLine.id)).all()
+    left = {int(k): int(v) for k, v in picked.items() if v and int(v) > 0}
+    for line_id, iid, open_qty in lines:
+        qty = min(open_qty, left.get(iid, 0))
+        if qty <= 0:
+            continue
+        try:
+            pick_line(session, line_id, qty)
+        except StockError:
+            continue  # nothing was changed for this line; reported as shortfall
+        left[iid] -= qty
+    if not session.scalar(select(func.count(OrderLine.id)).join(WaveOrder, WaveOrder.order_id==OrderLine.order_id)
+                          .where(WaveOrder.wave_id==wave_id, OrderLine.qty > OrderLine.picked_qty)):
+        session.get(Wave, wave_id).status = "picked"
+    return {iid: q for iid, q in left.items() if q > 0}
+
+def open_waves(session):
+    return session.execute(select(Wave.id, Wave.created_at, func.count(WaveOrder.order_id))
+                           .join(WaveOrder, WaveOrder.wave_id==Wave.id)
+                           .where(Wave.status=="released").group_by(Wave.id).order_by(Wave.id)).all()